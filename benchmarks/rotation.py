@@ -0,0 +1,85 @@
+"""Per-snapshot cost of rotating pictures on the brick versus tagging them.
+
+Pictures used to be decoded, rotated and re-encoded before sending (as
+'convert -rotate 270' did). Now they're sent untouched with their
+orientation in the frame header, and clients rotate them for display.
+"""
+
+import argparse
+import io
+import json
+import struct
+import time
+from collections.abc import Callable
+
+from PIL import Image
+
+# Same as the websocket module's binary frame header
+_FRAME_HEADER = struct.Struct("!BBH")
+_FRAME_SNAPSHOT = 1
+
+_WIDTH = 800
+_HEIGHT = 600
+_ROTATION = 270
+
+
+def _picture(quality: int) -> bytes:
+    # Noisy enough that it compresses about as well as a real photo
+    size = (_WIDTH // 8, _HEIGHT // 8)
+    image = Image.merge(
+        "RGB",
+        [Image.effect_noise(size, 64) for _ in range(3)],
+    )
+    image = image.resize((_WIDTH, _HEIGHT), Image.Resampling.BILINEAR)
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def _rotate(data: bytes, quality: int) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        # PIL rotates anticlockwise
+        rotated = image.rotate(-_ROTATION, expand=True)
+    out = io.BytesIO()
+    rotated.save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def _tag(data: bytes) -> bytes:
+    return _FRAME_HEADER.pack(_FRAME_SNAPSHOT, _ROTATION // 90, 0) + data
+
+
+def _time(fn: Callable[[], bytes], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    data = _picture(args.quality)
+    rotate = _time(lambda: _rotate(data, args.quality), args.iterations)
+    tag = _time(lambda: _tag(data), args.iterations)
+
+    results = {
+        "picture_bytes": len(data),
+        "rotate_ms": rotate * 1e3,
+        "tag_ms": tag * 1e3,
+        "saved_ms": (rotate - tag) * 1e3,
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for k, v in results.items():
+            print(f"{k:>16}: {v:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""How long the Dalek takes to start, and which imports it spends that on.
+
+Each run starts a fresh 'python -m dalek' on the fake ev3 backend, and
+times how long it takes before the websocket server accepts connections.
+The import report comes from 'python -X importtime'.
+"""
+
+import argparse
+import json
+import logging
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import NamedTuple
+
+_log = logging.getLogger(__name__)
+
+# Same as the main module's
+_PORT = 12346
+_POLL_INTERVAL = 0.01
+_TIMEOUT = 30.0
+
+_IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class ImportTime(NamedTuple):
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def import_times(module: str) -> list[ImportTime]:
+    """Import a module in a fresh interpreter, and time every import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times.append(
+                ImportTime(
+                    name,
+                    len(indent) // 2,
+                    int(self_us),
+                    int(cumulative_us),
+                ),
+            )
+    return times
+
+
+def import_time_us(module: str) -> int:
+    """Cumulative time to import a module, in microseconds."""
+    for t in import_times(module):
+        if t.module == module:
+            return t.cumulative_us
+    return 0
+
+
+def _direct_imports(
+    times: list[ImportTime],
+    module: str,
+) -> list[ImportTime]:
+    # Each module's line comes after those of the modules it imported
+    children: list[ImportTime] = []
+    for t in times:
+        if t.depth == 1:
+            children.append(t)
+        elif t.depth == 0:
+            if t.module == module:
+                return children
+            children = []
+    return []
+
+
+def _time_to_listening(sound_dir: str) -> float | None:
+    start = time.perf_counter()
+    with subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "dalek",
+            sound_dir,
+            "true",
+            "--fake-camera",
+            "--audio-sink",
+            "null",
+            "--ev3-backend",
+            "fake",
+            "--fast-start",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    ) as p:
+        try:
+            while time.perf_counter() - start < _TIMEOUT:
+                if p.poll() is not None:
+                    _log.error(f"dalek exited with code {p.returncode}")
+                    return None
+                try:
+                    with socket.create_connection(("localhost", _PORT)):
+                        return time.perf_counter() - start
+                except OSError:
+                    time.sleep(_POLL_INTERVAL)
+            _log.error("dalek didn't start listening")
+            return None
+        finally:
+            p.send_signal(signal.SIGINT)
+            p.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=15,
+        help="Number of slowest imports to list",
+    )
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+
+    module = "dalek.__main__"
+    imports = import_times(module)
+    slowest = sorted(
+        _direct_imports(imports, module),
+        key=lambda t: t.cumulative_us,
+        reverse=True,
+    )[: args.top]
+
+    listening = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(args.runs):
+            elapsed = _time_to_listening(tmp)
+            if elapsed is None:
+                sys.exit(1)
+            listening.append(elapsed)
+
+    results = {
+        "import_ms": next(
+            t.cumulative_us / 1e3 for t in imports if t.module == module
+        ),
+        "listening_min_ms": min(listening) * 1e3,
+        "listening_median_ms": statistics.median(listening) * 1e3,
+    }
+
+    if args.json:
+        print(
+            json.dumps(
+                results
+                | {
+                    "imports_ms": {
+                        t.module: t.cumulative_us / 1e3 for t in slowest
+                    },
+                },
+                indent=2,
+            ),
+        )
+    else:
+        for k, v in results.items():
+            print(f"{k:>20}: {v:.2f}")
+        print()
+        for t in slowest:
+            print(f"{t.module:>40}: {t.cumulative_us / 1e3:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Load generator and throughput/latency benchmark for the websocket stack.
+
+Runs the real server stack on the fake ev3 backend in this process, and
+synthetic clients in a child process so that they don't count towards the
+server's CPU time.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import struct
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from typing import NamedTuple
+
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.asyncio.server import serve
+
+from dalek import audio, ev3, latency
+from dalek.dalek import Dalek
+from dalek.websocket import handler as websocket_handler
+
+_log = logging.getLogger(__name__)
+
+_LAG_PROBE_INTERVAL = 0.01
+
+# Same as the websocket module's binary command format
+_BINARY_COMMAND = struct.Struct("!BBf")
+_BINARY_BEGIN = 1
+_BINARY_DRIVE = 1
+_BINARY_TURN = 2
+
+
+class _Load(NamedTuple):
+    duration: float
+    joystick_rate: float
+    sound_rate: float
+    snapshot_rate: float
+    spectators: int
+    binary: bool
+
+
+async def _every(
+    rate: float,
+    duration: float,
+    fn: Callable[[int], Awaitable[None]],
+) -> None:
+    if rate <= 0:
+        return
+    interval = 1.0 / rate
+    start = time.monotonic()
+    n = 0
+    while (now := time.monotonic()) - start < duration:
+        await fn(n)
+        n += 1
+        await asyncio.sleep(max(start + n * interval - now, 0.0))
+
+
+async def _clients(port: int, load: _Load) -> None:
+    url = f"ws://localhost:{port}"
+
+    async def spectator() -> None:
+        async with connect(url, compression=None) as ws:
+            # Keep reading so that the server isn't blocked on this client
+            deadline = time.monotonic() + load.duration
+            while time.monotonic() < deadline:
+                try:
+                    await asyncio.wait_for(ws.recv(), timeout=load.duration)
+                except TimeoutError:
+                    break
+
+    async with connect(url, compression=None) as ws:
+        await ws.recv()
+        if load.binary:
+            await ws.send(json.dumps(["features", "binarycontrol"]))
+        drain = asyncio.create_task(_drain(ws))
+
+        async def joystick(n: int) -> None:
+            value = ((n % 200) - 100) / 100.0
+            drive = n % 2 == 0
+            if load.binary:
+                await ws.send(
+                    _BINARY_COMMAND.pack(
+                        _BINARY_BEGIN,
+                        _BINARY_DRIVE if drive else _BINARY_TURN,
+                        value,
+                    ),
+                )
+            else:
+                name = "drive" if drive else "turn"
+                await ws.send(json.dumps(["begin", name, str(value)]))
+
+        async def sound(_: int) -> None:
+            await ws.send(json.dumps(["playsound", "Exterminate!"]))
+
+        async def snapshot(_: int) -> None:
+            await ws.send(json.dumps(["snapshot"]))
+
+        await asyncio.gather(
+            *(spectator() for _ in range(load.spectators)),
+            _every(load.joystick_rate, load.duration, joystick),
+            _every(load.sound_rate, load.duration, sound),
+            _every(load.snapshot_rate, load.duration, snapshot),
+        )
+        await ws.send(json.dumps(["stop"]))
+        drain.cancel()
+
+
+async def _drain(ws: ClientConnection) -> None:
+    async for _ in ws:
+        pass
+
+
+def _run_clients(port: int, load: _Load) -> None:
+    asyncio.run(_clients(port, load))
+
+
+async def _lag_probe(lag: latency.Histogram) -> None:
+    while True:
+        start = time.monotonic_ns()
+        await asyncio.sleep(_LAG_PROBE_INTERVAL)
+        lag.record(
+            time.monotonic_ns() - start - int(_LAG_PROBE_INTERVAL * 1e9),
+        )
+
+
+async def _benchmark(load: _Load) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        async with (
+            Dalek(
+                tmp,
+                "true",
+                [sys.executable, "-m", "dalek.fake_capture"],
+                None,
+                audio_sink=audio.NullSink(),
+                fast_start=True,
+            ).run() as dalek,
+            serve(
+                websocket_handler(dalek),
+                "localhost",
+                0,
+                compression=None,
+            ) as server,
+        ):
+            port = server.sockets[0].getsockname()[1]
+            latency.reset()
+            lag = latency.Histogram()
+            lag_task = asyncio.create_task(_lag_probe(lag))
+
+            cpu_start = time.process_time()
+            wall_start = time.monotonic()
+            clients = multiprocessing.get_context("spawn").Process(
+                target=_run_clients,
+                args=(port, load),
+            )
+            clients.start()
+            await asyncio.to_thread(clients.join)
+            wall = time.monotonic() - wall_start
+            cpu = time.process_time() - cpu_start
+
+            lag_task.cancel()
+            server.close()
+
+    handled = latency.Histogram()
+    for (source, _, stage), h in latency.histograms().items():
+        if source == latency.Source.WEBSOCKET and stage == latency.Stage.TOTAL:
+            handled.merge(h)
+
+    return {
+        "commands": handled.count,
+        "commands_per_s": handled.count / load.duration,
+        "latency_p50_ms": handled.percentile_ns(50) / 1e6,
+        "latency_p99_ms": handled.percentile_ns(99) / 1e6,
+        "latency_max_ms": handled.max_ns / 1e6,
+        "loop_lag_p50_ms": lag.percentile_ns(50) / 1e6,
+        "loop_lag_p99_ms": lag.percentile_ns(99) / 1e6,
+        "loop_lag_max_ms": lag.max_ns / 1e6,
+        "cpu_s": cpu,
+        "cpu_percent": 100 * cpu / wall,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument(
+        "--joystick-rate",
+        type=float,
+        default=50.0,
+        help="Movement commands per second",
+    )
+    parser.add_argument(
+        "--sound-rate",
+        type=float,
+        default=2.0,
+        help="Sound commands per second",
+    )
+    parser.add_argument(
+        "--snapshot-rate",
+        type=float,
+        default=1.0,
+        help="Snapshot requests per second",
+    )
+    parser.add_argument("--spectators", type=int, default=0)
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="Use the binary control protocol",
+    )
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level)
+
+    # The benchmark mustn't drive the real motors, even on the brick
+    ev3.use("fake")
+
+    results = asyncio.run(
+        _benchmark(
+            _Load(
+                args.duration,
+                args.joystick_rate,
+                args.sound_rate,
+                args.snapshot_rate,
+                args.spectators,
+                args.binary,
+            ),
+        ),
+    )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for k, v in results.items():
+            print(f"{k:>16}: {v:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,15 @@
 import argparse
 import asyncio
 import logging
-from contextlib import suppress
+import sys
+from contextlib import ExitStack, suppress
 
 from websockets.asyncio.server import serve
 
+from dalek import audio, ev3, latency, tts
 from dalek.controller import handler as controller_handler
 from dalek.dalek import Dalek
+from dalek.recording import Recorder
 from dalek.websocket import handler as websocket_handler
 
 _log = logging.getLogger(__name__)
@@ -25,18 +28,114 @@ async def main() -> None:
     )
     parser.add_argument("sound_dir", help="Directory containing sound files")
     parser.add_argument("text_to_speech_command", help="Text to speech command")
-    parser.add_argument("take_picture_command", help="Take picture command")
-    parser.add_argument("camera_output_file", help="File to save pictures to")
+    camera = parser.add_mutually_exclusive_group()
+    camera.add_argument(
+        "--capture-command",
+        help="Command that streams MJPEG from the camera to stdout",
+    )
+    camera.add_argument(
+        "--fake-camera",
+        action="store_true",
+        help="Capture from a fake camera, for testing",
+    )
+    parser.add_argument(
+        "--camera-device",
+        default="/dev/video0",
+        help="Camera device to capture from",
+    )
+    parser.add_argument(
+        "--camera-rotation",
+        type=int,
+        choices=(0, 90, 180, 270),
+        default=0,
+        help="Degrees clockwise to rotate pictures by for display",
+    )
+    parser.add_argument(
+        "--max-stream-fps",
+        type=float,
+        default=10.0,
+        help="Maximum frame rate clients can stream at",
+    )
+    parser.add_argument(
+        "--record",
+        help="Record all commands to this file, for use with dalek.replay",
+    )
+    parser.add_argument(
+        "--audio-sink",
+        default="aplay",
+        type=audio.sink,
+        help="Where to play sounds: 'aplay', 'null', or 'file:PATH'",
+    )
+    parser.add_argument(
+        "--tts-cache",
+        help="Directory to cache synthesized speech in",
+    )
+    parser.add_argument(
+        "--tts-cache-size",
+        type=float,
+        default=16.0,
+        help="Maximum size of the speech cache, in MiB",
+    )
+    parser.add_argument(
+        "--fast-start",
+        action="store_true",
+        help="Skip the awakening sequence",
+    )
+    parser.add_argument(
+        "--ev3-backend",
+        help=(
+            f"Hardware backend: one of {', '.join(ev3.backends())}, or a "
+            f"module name; detected by default, or from ${ev3.BACKEND_ENV}"
+        ),
+    )
     args = parser.parse_args()
 
+    if args.ev3_backend:
+        ev3.use(args.ev3_backend)
+
+    with ExitStack() as stack:
+        recorder = (
+            stack.enter_context(Recorder(args.record)) if args.record else None
+        )
+        await _run(args, recorder)
+
+
+def _capture_command(args: argparse.Namespace) -> list[str] | None:
+    if args.fake_camera:
+        return [sys.executable, "-m", "dalek.fake_capture"]
+    if args.capture_command:
+        return [args.capture_command]
+    return None
+
+
+async def _run(args: argparse.Namespace, recorder: Recorder | None) -> None:
     async with (
         Dalek(
             args.sound_dir,
             args.text_to_speech_command,
-            args.take_picture_command,
-            args.camera_output_file,
+            _capture_command(args),
+            None if args.fake_camera else args.camera_device,
+            args.max_stream_fps,
+            recorder,
+            args.audio_sink,
+            tts.Cache(
+                args.tts_cache,
+                args.text_to_speech_command,
+                int(args.tts_cache_size * 1024 * 1024),
+            )
+            if args.tts_cache
+            else None,
+            camera_rotation=args.camera_rotation,
+            fast_start=args.fast_start,
         ).run() as dalek,
-        serve(websocket_handler(dalek), "", PORT) as server,
+        # Most of what we send is JPEG data, which doesn't compress, so
+        # per-message deflate would only burn CPU on the brick.
+        serve(
+            websocket_handler(dalek),
+            "",
+            PORT,
+            compression=None,
+        ) as server,
     ):
         _log.info("controller starting")
         controller_task: asyncio.Task[None] = asyncio.create_task(
@@ -50,6 +149,7 @@ async def main() -> None:
         with suppress(asyncio.CancelledError):
             await controller_task
         _log.info("controller stopped")
+        latency.log_report()
 
 
 if __name__ == "__main__":
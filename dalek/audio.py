@@ -0,0 +1,377 @@
+"""Sound playback without starting a process per sound."""
+
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+from array import array
+from contextlib import suppress
+from typing import NamedTuple, Protocol, override
+
+_log = logging.getLogger(__name__)
+
+_RIFF_HEADER = struct.Struct("<4sI4s")
+_CHUNK_HEADER = struct.Struct("<4sI")
+_FMT_CHUNK = struct.Struct("<HHIIHH")
+_WAVE_FORMAT_PCM = 1
+
+_APLAY_FORMATS = {1: "U8", 2: "S16_LE", 3: "S24_3LE", 4: "S32_LE"}
+
+# Files up to this size are read into memory rather than mapped. A mapped
+# file that's rewritten in place while it's playing kills the process with
+# SIGBUS; all the Dalek's own sounds are well under this.
+_MAX_READ_SIZE = 1024 * 1024
+
+
+class Format(NamedTuple):
+    channels: int
+    rate: int
+    sample_width: int
+
+    @property
+    def frame_size(self) -> int:
+        return self.channels * self.sample_width
+
+
+class Clip:
+    """PCM data from a WAV file, read or mapped into memory."""
+
+    def __init__(self, fmt: Format, data: memoryview) -> None:
+        super().__init__()
+        self._format = fmt
+        self._data = data
+
+    @property
+    def format(self) -> Format:
+        return self._format
+
+    @property
+    def data(self) -> memoryview:
+        return self._data
+
+    @property
+    def duration(self) -> float:
+        return len(self._data) / (self._format.frame_size * self._format.rate)
+
+
+def load_wav(path: str) -> Clip | None:
+    """Load a WAV file; large ones are mapped, so they must only ever be
+    replaced (e.g. with os.replace), not rewritten in place."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size <= _MAX_READ_SIZE:
+                return _parse_wav(path, f.read())
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        _log.error(f"failed to load '{path}': {e}")
+        return None
+
+    # Ask the kernel to read it in now, rather than when it's first played
+    if hasattr(m, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+        m.madvise(mmap.MADV_WILLNEED)
+
+    clip = None
+    try:
+        clip = _parse_wav(path, m)
+    finally:
+        # A clip keeps the mapping alive; otherwise, nothing else will close it
+        if clip is None:
+            m.close()
+    return clip
+
+
+def _parse_wav(path: str, m: bytes | mmap.mmap) -> Clip | None:
+    try:
+        riff, _, wave = _RIFF_HEADER.unpack_from(m, 0)
+        if riff != b"RIFF" or wave != b"WAVE":
+            _log.error(f"'{path}' is not a WAV file")
+            return None
+
+        fmt: Format | None = None
+        offset = _RIFF_HEADER.size
+        while offset + _CHUNK_HEADER.size <= len(m):
+            chunk_id, size = _CHUNK_HEADER.unpack_from(m, offset)
+            offset += _CHUNK_HEADER.size
+            if chunk_id == b"fmt ":
+                audio_format, channels, rate, _, _, bits = (
+                    _FMT_CHUNK.unpack_from(
+                        m,
+                        offset,
+                    )
+                )
+                if audio_format != _WAVE_FORMAT_PCM or bits % 8 != 0:
+                    _log.error(f"'{path}' is not uncompressed PCM")
+                    return None
+                fmt = Format(channels, rate, bits // 8)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    _log.error(f"'{path}' has no format chunk before its data")
+                    return None
+                end = min(offset + size, len(m))
+                end -= (end - offset) % fmt.frame_size
+                return Clip(fmt, memoryview(m)[offset:end])
+            # Chunks are padded to an even size
+            offset += size + (size & 1)
+    except struct.error:
+        pass
+
+    _log.error(f"'{path}' is truncated")
+    return None
+
+
+class Sink(Protocol):
+    async def write(self, fmt: Format, data: memoryview) -> None: ...
+    async def close(self) -> None: ...
+
+
+class NullSink(Sink):
+    """Discards everything."""
+
+    @override
+    async def write(self, fmt: Format, data: memoryview) -> None:
+        pass
+
+    @override
+    async def close(self) -> None:
+        pass
+
+
+class FileSink(Sink):
+    """Appends raw PCM to a file, for testing off the brick."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self._path = path
+
+    @override
+    async def write(self, fmt: Format, data: memoryview) -> None:
+        # Only needed off the brick, so not worth importing at startup
+        import aiofiles
+
+        async with aiofiles.open(self._path, "ab") as f:
+            await f.write(data)
+
+    @override
+    async def close(self) -> None:
+        pass
+
+
+class AplaySink(Sink):
+    """Streams raw PCM into a long-lived aplay process."""
+
+    # Keep aplay's buffer small, so that stopping is near-instant
+    _BUFFER_TIME_US = 100000
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._process: asyncio.subprocess.Process | None = None
+        self._format: Format | None = None
+
+    async def _start(self, fmt: Format) -> asyncio.subprocess.Process:
+        if (
+            self._process
+            and self._format == fmt
+            and self._process.returncode is None
+        ):
+            return self._process
+
+        await self.close()
+        self._process = await asyncio.create_subprocess_exec(
+            "aplay",
+            "-q",
+            "-t",
+            "raw",
+            "-f",
+            _APLAY_FORMATS.get(fmt.sample_width, "S16_LE"),
+            "-c",
+            str(fmt.channels),
+            "-r",
+            str(fmt.rate),
+            f"--buffer-time={self._BUFFER_TIME_US}",
+            "-",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self._format = fmt
+        _log.info(f"started aplay for {fmt}")
+        return self._process
+
+    @override
+    async def write(self, fmt: Format, data: memoryview) -> None:
+        p = await self._start(fmt)
+        if not p.stdin:
+            return
+        try:
+            p.stdin.write(data)
+            await p.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # Reaped, so it doesn't linger as a zombie
+            await p.wait()
+            _log.error(f"aplay exited with code {p.returncode}")
+            self._process = None
+            self._format = None
+
+    @override
+    async def close(self) -> None:
+        if self._process:
+            if self._process.stdin:
+                self._process.stdin.close()
+            with suppress(ProcessLookupError):
+                self._process.terminate()
+            await self._process.wait()
+            self._process = None
+            self._format = None
+
+
+def sink(spec: str) -> Sink:
+    """Create a sink from 'aplay', 'null', or 'file:PATH'."""
+    if spec == "aplay":
+        return AplaySink()
+    if spec == "null":
+        return NullSink()
+    if spec.startswith("file:"):
+        return FileSink(spec.removeprefix("file:"))
+    msg = f"unknown audio sink '{spec}'"
+    raise ValueError(msg)
+
+
+class Player:
+    """Plays clips through a sink, staying only slightly ahead of real time.
+
+    Cancelling play() stops the sound: at most _LEAD seconds of audio, plus
+    whatever the sink buffers, has been written ahead.
+    """
+
+    _CHUNK_TIME = 0.05
+    _LEAD = 0.05
+
+    def __init__(self, sink: Sink, *, realtime: bool = True) -> None:
+        super().__init__()
+        self._sink = sink
+        self._realtime = realtime
+
+    async def play(self, clip: Clip) -> None:
+        fmt = clip.format
+        bytes_per_second = fmt.frame_size * fmt.rate
+        chunk_size = max(
+            int(self._CHUNK_TIME * fmt.rate) * fmt.frame_size,
+            fmt.frame_size,
+        )
+
+        start = time.monotonic()
+        for offset in range(0, len(clip.data), chunk_size):
+            await self._sink.write(fmt, clip.data[offset : offset + chunk_size])
+            if self._realtime:
+                written = (offset + chunk_size) / bytes_per_second
+                delay = start + written - self._LEAD - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+        if self._realtime:
+            # Wait for the tail to actually play
+            delay = start + clip.duration - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        await self._sink.close()
+
+
+class Sound(NamedTuple):
+    path: str
+    clip: Clip
+    # Times, in seconds from the start, at which to toggle the lights
+    lights: array[float]
+
+    @property
+    def duration(self) -> float:
+        return self.clip.duration
+
+
+def _load_lights(path: str) -> array[float]:
+    lights = array("d")
+    try:
+        with open(path) as f:
+            lights.extend(float(line) for line in f if line.strip())
+    except FileNotFoundError:
+        return lights
+    except (OSError, ValueError) as e:
+        _log.error(f"failed to read light file '{path}': {e}")
+        return array("d")
+
+    if len(lights) % 2 != 0:
+        _log.error(f"light file '{path}' must have an even number of lines")
+        return array("d")
+    return lights
+
+
+class Catalog:
+    """Every sound in a directory, indexed by file name without extension.
+
+    Rebuilt by refresh() when any sound or light file is added, removed or
+    changed, so that looking up a sound never touches the disk. Large sounds
+    are mapped (see load_wav), so they must be replaced, not edited.
+    """
+
+    _REFRESH_INTERVAL = 5.0
+
+    def __init__(self, sound_dir: str) -> None:
+        super().__init__()
+        self._sound_dir = sound_dir
+        # Each sound and light file's modification time and size
+        self._stamps: dict[str, tuple[int, int]] | None = None
+        self._sounds: dict[str, Sound] = {}
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self._sounds)
+
+    def get(self, name: str) -> Sound | None:
+        return self._sounds.get(name)
+
+    def _stat(self) -> dict[str, tuple[int, int]]:
+        stamps = {}
+        with os.scandir(self._sound_dir) as entries:
+            for entry in entries:
+                if os.path.splitext(entry.name)[1] in (".wav", ".txt"):
+                    with suppress(FileNotFoundError):
+                        st = entry.stat()
+                        stamps[entry.name] = (st.st_mtime_ns, st.st_size)
+        return stamps
+
+    def refresh(self) -> bool:
+        try:
+            stamps = self._stat()
+        except OSError as e:
+            _log.error(f"failed to list sounds in '{self._sound_dir}': {e}")
+            return False
+        if stamps == self._stamps:
+            return False
+
+        sounds = {}
+        for name in stamps:
+            base, ext = os.path.splitext(name)
+            if ext != ".wav":
+                continue
+            path = os.path.join(self._sound_dir, name)
+            clip = load_wav(path)
+            if clip:
+                sounds[base] = Sound(
+                    path,
+                    clip,
+                    _load_lights(os.path.join(self._sound_dir, base + ".txt")),
+                )
+
+        # Swapped in whole, so lookups never see a half-built catalog
+        self._sounds = sounds
+        self._stamps = stamps
+        _log.info(f"loaded {len(sounds)} sounds from '{self._sound_dir}'")
+        return True
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self._REFRESH_INTERVAL)
+            await asyncio.to_thread(self.refresh)
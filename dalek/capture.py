@@ -0,0 +1,146 @@
+"""Camera capture helpers."""
+
+import asyncio
+import io
+import logging
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from contextlib import suppress
+
+_log = logging.getLogger(__name__)
+
+_SOI = b"\xff\xd8"
+_EOI = b"\xff\xd9"
+
+
+class MjpegSplitter:
+    """Splits a stream of concatenated JPEG images into separate images."""
+
+    _MAX_FRAME_SIZE = 4 * 1024 * 1024
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[bytes]:
+        self._buffer += data
+        frames = []
+
+        while True:
+            start = self._buffer.find(_SOI)
+            if start < 0:
+                # Keep a trailing 0xff in case it's the start of a marker
+                del self._buffer[: max(len(self._buffer) - 1, 0)]
+                break
+            end = self._buffer.find(_EOI, start + len(_SOI))
+            if end < 0:
+                del self._buffer[:start]
+                if len(self._buffer) > self._MAX_FRAME_SIZE:
+                    _log.warning("discarding oversized frame")
+                    self._buffer.clear()
+                break
+            end += len(_EOI)
+            frames.append(bytes(self._buffer[start:end]))
+            del self._buffer[:end]
+
+        return frames
+
+
+def scale_jpeg(data: bytes, scale: int, quality: int) -> bytes | None:
+    """Shrink a JPEG to 1/scale of its size.
+
+    Scale should be 2, 4 or 8, so that libjpeg can skip the detail while
+    decoding rather than decoding the whole image and then resizing it.
+    """
+    # Slow to import, and not needed unless clients want small pictures
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (image.width // scale, image.height // scale))
+            out = io.BytesIO()
+            image.save(out, "JPEG", quality=quality)
+    except (OSError, ValueError) as e:
+        _log.error(f"failed to scale picture: {e}")
+        return None
+    return out.getvalue()
+
+
+class Capture:
+    """Keeps a capture process running, and hands each frame to a callback.
+
+    The process is run as 'command... FPS [DEVICE]' and must write MJPEG to
+    stdout until it's killed. Cameras only support some frame rates, so
+    frames arriving faster than FPS are dropped here.
+    """
+
+    _READ_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        command: Sequence[str],
+        device: str | None,
+        on_frame: Callable[[bytes], Awaitable[None]],
+    ) -> None:
+        super().__init__()
+        self._command = command
+        self._device = device
+        self._on_frame = on_frame
+        self._fps: float | None = None
+        # Owned here rather than by the task, which might be cancelled
+        # before it ever runs
+        self._process: asyncio.subprocess.Process | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def fps(self) -> float | None:
+        return self._fps if self._task and not self._task.done() else None
+
+    async def start(self, fps: float) -> None:
+        if self.fps == fps:
+            return
+        await self.stop()
+        self._process = await asyncio.create_subprocess_exec(
+            *self._command,
+            f"{fps:g}",
+            *([self._device] if self._device else []),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self._fps = fps
+        self._task = asyncio.create_task(self._read(self._process))
+        _log.info(f"started capture at {fps:g} fps")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._process:
+            with suppress(ProcessLookupError):
+                self._process.terminate()
+            await self._process.wait()
+            self._process = None
+            self._fps = None
+            _log.info("stopped capture")
+
+    async def _read(self, p: asyncio.subprocess.Process) -> None:
+        if not p.stdout:
+            return
+
+        splitter = MjpegSplitter()
+        # A little slack, so that jitter doesn't halve the frame rate
+        interval = 0.9 / self._fps if self._fps else 0.0
+        last = -interval
+        while data := await p.stdout.read(self._READ_SIZE):
+            frames = splitter.feed(data)
+            now = time.monotonic()
+            if frames and now - last >= interval:
+                last = now
+                # Only the newest frame is worth handing on; anything
+                # older in the same read is already stale.
+                await self._on_frame(frames[-1])
+
+        if await p.wait() != 0:
+            _log.error(f"capture process failed with exit code {p.returncode}")
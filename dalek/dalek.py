@@ -1,34 +1,41 @@
 """Main logic for the Dalek."""
 
 import asyncio
+import contextvars
+import functools
+import heapq
 import logging
+import math
 import os
 import os.path
+import threading
 import time
 from abc import ABC, abstractmethod
-from collections.abc import AsyncGenerator, Awaitable, Callable
+from collections.abc import AsyncGenerator, Awaitable, Callable, Sequence
 from contextlib import asynccontextmanager, suppress
-from enum import StrEnum
+from enum import IntEnum, StrEnum
 from types import TracebackType
-from typing import Self, override
-
-import aiofiles
-from ev3dev2.motor import OUTPUT_A, OUTPUT_B, OUTPUT_C, OUTPUT_D, Motor
-from ev3dev2.sensor import INPUT_2
-
-from dalek import ev3
+from typing import NamedTuple, Self, override
+
+from dalek import audio, ev3, latency, tts
+from dalek.capture import Capture
+from dalek.recording import Op, Recorder
+from dalek.safety import PlungerGuard
+from dalek.scheduler import Job, Scheduler
+from dalek.telemetry import Probe, Telemetry
 from dalek.utils import (
+    RingBuffer,
     clamp_control_range,
     espeakify,
     sign,
     sound_filename,
 )
 
-_LEFT_WHEEL_PORT = OUTPUT_D
-_RIGHT_WHEEL_PORT = OUTPUT_A
-_HEAD_PORT = OUTPUT_B
-_LED_PORT = OUTPUT_C
-_PLUNGER_PORT = INPUT_2
+_LEFT_WHEEL_PORT = ev3.OUTPUT_D
+_RIGHT_WHEEL_PORT = ev3.OUTPUT_A
+_HEAD_PORT = ev3.OUTPUT_B
+_LED_PORT = ev3.OUTPUT_C
+_PLUNGER_PORT = ev3.INPUT_2
 
 _log = logging.getLogger(__name__)
 
@@ -108,43 +115,86 @@ class _Actor(ABC):
     ) -> None:
         await self.disconnect()
 
+    def probes(self) -> dict[str, Probe]:
+        """What telemetry can sample from this actor."""
+        return {}
+
     @abstractmethod
     async def disconnect(self) -> None:
         raise NotImplementedError
 
 
+class SpeechPolicy(StrEnum):
+    """What to do with a sound when another is already playing."""
+
+    QUEUE = "queue"
+    REPLACE = "replace"
+    DROP = "drop"
+
+
+class SpeechPriority(IntEnum):
+    NORMAL = 0
+    LIFECYCLE = 1
+
+
+class _Speech(NamedTuple):
+    # Negated, so that the heap pops the highest priority first
+    priority: int
+    sequence: int
+    queued_ns: int
+    text: str
+
+
 class _Voice(_Actor):
+    _MAX_QUEUED = 4
+
     def __init__(
         self,
         sound_dir: str,
         text_to_speech_command: str,
         leds: _Leds,
+        sink: audio.Sink,
+        tts_cache: tts.Cache | None,
     ) -> None:
         super().__init__()
         self._sound_dir = sound_dir
         self._text_to_speech_command = text_to_speech_command
         self._leds = leds
+        self._catalog = audio.Catalog(sound_dir)
+        self._tts_cache = tts_cache
+        self._background: list[asyncio.Task[None]] = []
+        self._player = audio.Player(sink)
         self._lock = asyncio.Lock()
-        self._task: asyncio.Task[None] | None = None
+        self._queue: list[_Speech] = []
+        self._sequence = 0
+        self._worker: asyncio.Task[None] | None = None
+        self._current: tuple[int, asyncio.Task[None]] | None = None
+        self._played = 0
+        self._dropped = 0
+        self._replaced = 0
+        self._max_depth = 0
+        self._wait_times = latency.Histogram()
         _log.info("created voice")
 
-    async def _flash_lights(self, sound: str) -> None:
-        path = os.path.join(self._sound_dir, sound + ".txt")
-
-        try:
-            async with aiofiles.open(path) as f:
-                l = [float(line.strip()) async for line in f]
-        except OSError as e:
-            _log.error(f"failed to read light file for '{sound}': {e}")
-            return
-
-        if len(l) % 2 != 0:
-            _log.error("sound file must have an even number of lines")
-            return
+    @override
+    async def __aenter__(self) -> Self:
+        self._background.append(asyncio.create_task(self._catalog.watch()))
+        if self._tts_cache:
+            self._background.append(
+                asyncio.create_task(
+                    self._tts_cache.prewarm(
+                        s
+                        for s in Sounds
+                        if not self._catalog.get(sound_filename(s))
+                    ),
+                ),
+            )
+        return self
 
+    async def _flash_lights(self, lights: Sequence[float]) -> None:
         on = False
         last = 0.0
-        for t in l:
+        for t in lights:
             await asyncio.sleep(t - last)
             if on:
                 self._leds.off()
@@ -153,83 +203,213 @@ class _Voice(_Actor):
             on = not on
             last = t
 
-    async def speak(self, text: str) -> None:
-        async def task() -> None:
-            self._leds.off()
-
-            filename = sound_filename(text)
-            path = os.path.join(self._sound_dir, filename + ".wav")
+    async def _play(self, text: str) -> None:
+        self._leds.off()
+        try:
+            sound = self._catalog.get(sound_filename(text))
 
-            if os.path.exists(path):
-                p = await asyncio.create_subprocess_exec(
-                    "aplay",
-                    path,
-                    stdout=asyncio.subprocess.DEVNULL,
-                    stderr=asyncio.subprocess.DEVNULL,
-                )
-                await self._flash_lights(filename)
-            else:
-                p = await asyncio.create_subprocess_exec(
-                    self._text_to_speech_command,
-                    espeakify(text),
-                    stdout=asyncio.subprocess.DEVNULL,
-                    stderr=asyncio.subprocess.DEVNULL,
+            if sound:
+                await asyncio.gather(
+                    self._player.play(sound.clip),
+                    self._flash_lights(sound.lights),
                 )
+                return
 
-            if await p.wait() != 0:
-                _log.error(
-                    f"speech subprocess failed with exit code {p.returncode}",
-                )
+            if self._tts_cache:
+                clip = await self._tts_cache.get(text)
+                if clip:
+                    await self._player.play(clip)
+                    return
+
+            p = await asyncio.create_subprocess_exec(
+                self._text_to_speech_command,
+                espeakify(text),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            try:
+                if await p.wait() != 0:
+                    _log.error(
+                        "speech subprocess failed with exit code "
+                        f"{p.returncode}",
+                    )
+            except asyncio.CancelledError:
+                with suppress(ProcessLookupError):
+                    p.terminate()
+                raise
+        finally:
+            self._leds.off()
 
+    async def _run_queue(self) -> None:
+        while self._queue:
+            speech = heapq.heappop(self._queue)
+            self._wait_times.record(time.monotonic_ns() - speech.queued_ns)
+            self._current = (
+                -speech.priority,
+                asyncio.create_task(self._play(speech.text)),
+            )
+            # Not 'await', so that preempting the sound doesn't stop the queue
+            await asyncio.wait([self._current[1]])
+            self._current = None
+            self._played += 1
+        self._worker = None
+
+    def _drop_queued(self, priority: SpeechPriority) -> int:
+        kept = [s for s in self._queue if -s.priority > priority]
+        dropped = len(self._queue) - len(kept)
+        if dropped:
+            self._queue = kept
+            heapq.heapify(self._queue)
+        return dropped
+
+    async def speak(
+        self,
+        text: str,
+        policy: SpeechPolicy = SpeechPolicy.QUEUE,
+        priority: SpeechPriority = SpeechPriority.NORMAL,
+    ) -> None:
         async with self._lock:
-            if self._task and not self._task.done():
-                _log.warning(
-                    "attempted to speak when another sound is in progress",
-                )
+            busy = self._current is not None or bool(self._queue)
+
+            if policy == SpeechPolicy.DROP and busy:
+                _log.info(f"dropped '{text}' because another sound is playing")
+                self._dropped += 1
                 return
 
-            self._task = asyncio.create_task(task())
+            if policy == SpeechPolicy.REPLACE:
+                self._replaced += self._drop_queued(priority)
+                if self._current and self._current[0] <= priority:
+                    self._current[1].cancel()
+                    self._replaced += 1
+
+            if len(self._queue) >= self._MAX_QUEUED:
+                # Lowest priority, and newest within that
+                worst = max(self._queue)
+                if -worst.priority >= priority:
+                    _log.info(f"dropped '{text}' because the queue is full")
+                    self._dropped += 1
+                    return
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                self._dropped += 1
+
+            self._sequence += 1
+            heapq.heappush(
+                self._queue,
+                _Speech(-priority, self._sequence, time.monotonic_ns(), text),
+            )
+            self._max_depth = max(self._max_depth, len(self._queue))
+
+            if not self._worker:
+                self._worker = asyncio.create_task(self._run_queue())
 
     async def _stop(self) -> None:
-        self._leds.off()
-        if self._task:
-            self._task.cancel()
+        self._dropped += len(self._queue)
+        self._queue = []
+        if self._worker:
+            self._worker.cancel()
             with suppress(asyncio.CancelledError):
-                await self._task
-            self._task = None
-
-    async def _wait(self) -> None:
-        if self._task:
-            await self._task
-            self._task = None
+                await self._worker
+            self._worker = None
+        if self._current:
+            self._current[1].cancel()
+            with suppress(asyncio.CancelledError):
+                await self._current[1]
+            self._current = None
+        self._leds.off()
 
     async def stop(self) -> None:
         async with self._lock:
             await self._stop()
 
     async def wait(self) -> None:
+        """Wait for what's queued so far to play.
+
+        Not under the lock, which would hold up everyone else's commands
+        until the sound ends.
+        """
         async with self._lock:
-            await self._wait()
+            worker = self._worker
+        if worker:
+            await asyncio.wait([worker])
 
     @override
     async def disconnect(self) -> None:
         async with self._lock:
-            await self._wait()
-            await self._stop()
+            # Finish what's playing, but not what the driver queued after it
+            self._dropped += len(self._queue)
+            self._queue = []
+            worker = self._worker
+        if worker:
+            await asyncio.wait([worker])
+        async with self._lock:
+            # Unless someone has started something new in the meantime
+            if self._worker in (None, worker):
+                await self._stop()
+
+    def log_report(self) -> None:
+        _log.info(
+            f"speech: played {self._played}, dropped {self._dropped}, "
+            f"replaced {self._replaced}, max queue depth {self._max_depth}, "
+            f"wait {self._wait_times}",
+        )
+
+    async def close(self) -> None:
+        await self.wait()
+        await self.disconnect()
+        await self._player.close()
+        for task in self._background:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        self._background = []
+        self.log_report()
+        if self._tts_cache:
+            self._tts_cache.log_report()
 
 
 class _Camera(_Actor):
-    def __init__(self, take_picture_command: str, output_file: str) -> None:
+    # Once a picture has been asked for, the camera is kept open at this rate
+    # so that later ones don't wait for it to start, until none have been
+    # asked for in _SNAPSHOT_IDLE_TIME
+    _SNAPSHOT_FPS = 2.0
+    _SNAPSHOT_IDLE_TIME = 10.0
+    # Pictures no older than this are handed out instead of waiting for a
+    # new one
+    _MAX_PICTURE_AGE = 1.0 / _SNAPSHOT_FPS
+
+    def __init__(
+        self,
+        capture_command: Sequence[str] | None,
+        device: str | None,
+        max_stream_fps: float,
+        rotation: int,
+    ) -> None:
         super().__init__()
-        self._take_picture_command = take_picture_command
-        self._output_file = output_file
+        self._rotation = rotation
+        self._capture = (
+            Capture(capture_command, device, self._on_frame)
+            if capture_command
+            else None
+        )
+        self._device = device
+        self._max_stream_fps = max_stream_fps
         self._lock = asyncio.Lock()
         self._handler: Callable[[bytes], Awaitable[None]] | None = None
-        self._task: asyncio.Task[None] | None = None
+        self._streaming = False
+        self._want_picture = False
+        self._latest: tuple[float, bytes] | None = None
+        self._idle: asyncio.Task[None] | None = None
         _log.info(f"created camera; camera found = {self._has_camera()}")
 
+    @property
+    def rotation(self) -> int:
+        """Degrees clockwise that pictures must be rotated to be upright."""
+        return self._rotation
+
     def _has_camera(self) -> bool:
-        return os.path.exists("/dev/video0")
+        # No device means the capture command doesn't need one
+        return self._device is None or os.path.exists(self._device)
 
     async def set_handler(self, h: Callable[[bytes], Awaitable[None]]) -> None:
         async with self._lock:
@@ -240,31 +420,46 @@ class _Camera(_Actor):
                 return
             self._handler = h
 
-    async def take_picture(self) -> None:
-        async def task() -> None:
-            p = await asyncio.create_subprocess_exec(
-                self._take_picture_command,
-                self._output_file,
-                stdout=asyncio.subprocess.DEVNULL,
-                stderr=asyncio.subprocess.DEVNULL,
-            )
-            if await p.wait() != 0:
-                _log.error(
-                    f"camera subprocess failed with exit code {p.returncode}",
-                )
-                return
+    async def _on_frame(self, frame: bytes) -> None:
+        self._latest = (time.monotonic(), frame)
+        if not (self._streaming or self._want_picture):
+            return
+        self._want_picture = False
+        # Not under the lock, so that stopping the capture can't deadlock
+        # with a frame being handed on
+        h = self._handler
+        if h:
+            await h(frame)
+
+    async def _cancel_idle(self) -> None:
+        # Only called under the lock, so the task is never in the middle of
+        # stopping the capture
+        if self._idle:
+            self._idle.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._idle
+            self._idle = None
 
-            try:
-                async with aiofiles.open(self._output_file, mode="rb") as f:
-                    data = await f.read()
-            except OSError as e:
-                _log.error(f"failed to take picture: {e}")
-                return
+    async def _restart_idle(self) -> None:
+        await self._cancel_idle()
+        self._idle = asyncio.create_task(self._stop_when_idle())
 
+    async def _stop_when_idle(self) -> None:
+        while True:
+            await asyncio.sleep(self._SNAPSHOT_IDLE_TIME)
             async with self._lock:
-                if self._handler:
-                    await self._handler(data)
+                if self._streaming:
+                    return
+                if self._want_picture:
+                    # Still waiting for a frame
+                    continue
+                if self._capture:
+                    await self._capture.stop()
+                    _log.info("stopped idle capture")
+                self._idle = None
+                return
 
+    async def take_picture(self) -> None:
         async with self._lock:
             if not self._handler:
                 _log.warning(
@@ -272,65 +467,170 @@ class _Camera(_Actor):
                 )
                 return
 
-            if self._task and not self._task.done():
-                _log.warning(
-                    "attempted to take a picture when another one is in "
-                    "progress",
-                )
+            if self._streaming:
+                _log.info("streaming, so not taking a separate picture")
                 return
 
-            if not self._has_camera():
+            if not self._capture or not self._has_camera():
                 _log.info(
                     "no camera found",
                 )
                 return
 
-            self._task = asyncio.create_task(task())
+            await self._restart_idle()
+            if (
+                self._capture.fps
+                and self._latest
+                and time.monotonic() - self._latest[0] < self._MAX_PICTURE_AGE
+            ):
+                await self._handler(self._latest[1])
+                return
+
+            self._want_picture = True
+            if not self._capture.fps:
+                await self._capture.start(self._SNAPSHOT_FPS)
+
+    async def _stop_stream(self) -> None:
+        if self._streaming:
+            self._streaming = False
+            if self._capture:
+                await self._capture.start(self._SNAPSHOT_FPS)
+                await self._restart_idle()
+            _log.info("stopped stream")
+
+    async def start_stream(self, fps: float) -> None:
+        async with self._lock:
+            if not self._handler:
+                _log.warning("attempted to stream when no handler exists")
+                return
+
+            if not self._capture or not self._has_camera():
+                _log.info("no camera found")
+                return
+
+            fps = min(max(fps, 1.0), self._max_stream_fps)
+            await self._cancel_idle()
+            await self._capture.start(fps)
+            self._streaming = True
+            _log.info(f"started stream at {fps:g} fps")
+
+    async def stop_stream(self) -> None:
+        async with self._lock:
+            await self._stop_stream()
 
     @override
     async def disconnect(self) -> None:
         async with self._lock:
-            if self._task:
-                self._task.cancel()
-                with suppress(asyncio.CancelledError):
-                    await self._task
-                self._task = None
+            self._streaming = False
+            self._want_picture = False
+            self._latest = None
+            await self._cancel_idle()
+            if self._capture:
+                await self._capture.stop()
             self._handler = None
 
 
 class _Battery(_Actor):
-    def __init__(self) -> None:
+    _SAMPLE_INTERVAL = 2.0
+    # Weight given to each new sample; the raw voltage sags and jumps with
+    # motor load
+    _SMOOTHING = 0.2
+    # Clients are only told when the voltage has moved this much, or when
+    # they haven't been told anything for _MAX_REPORT_INTERVAL
+    _HYSTERESIS = 0.05
+    _MAX_REPORT_INTERVAL = 60.0
+    _HISTORY_INTERVAL = 10.0
+    _HISTORY_SIZE = 360
+
+    def __init__(self, scheduler: Scheduler) -> None:
         super().__init__()
+        self._scheduler = scheduler
         self._power_supply = ev3.power_supply()
+        self._volts = self._power_supply.measured_volts
+        self._history = RingBuffer(self._HISTORY_SIZE)
+        self._history.append(self._volts)
         self._lock = asyncio.Lock()
-        self._task: asyncio.Task[None] | None = None
+        self._handler: Callable[[str], Awaitable[None]] | None = None
+        self._reported: float | None = None
+        self._reported_at = 0.0
+        self._samples = 0
+        self._job: Job | None = None
         _log.info("created battery")
 
+    @override
+    async def __aenter__(self) -> Self:
+        self._job = self._scheduler.every(
+            "battery",
+            self._SAMPLE_INTERVAL,
+            self._sample,
+        )
+        return self
+
+    @override
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await super().__aexit__(exc_type, exc_val, exc_tb)
+        if self._job:
+            self._job.cancel()
+            self._job = None
+
     def status(self) -> str:
-        return f"{self._power_supply.measured_volts:.2f}"
+        return f"{self._volts:.2f}"
 
-    async def set_handler(self, h: Callable[[str], Awaitable[None]]) -> None:
-        async def task() -> None:
-            while True:
-                await h(self.status())
-                await asyncio.sleep(10)
+    @property
+    def history_interval(self) -> float:
+        return self._HISTORY_INTERVAL
+
+    def history(self) -> list[float]:
+        return self._history.values()
+
+    @override
+    def probes(self) -> dict[str, Probe]:
+        return {"battery": Probe(lambda: self._volts, 100)}
+
+    async def _sample(self) -> None:
+        self._volts += self._SMOOTHING * (
+            self._power_supply.measured_volts - self._volts
+        )
+        self._samples += 1
+        per_history = round(self._HISTORY_INTERVAL / self._SAMPLE_INTERVAL)
+        if self._samples % per_history == 0:
+            self._history.append(self._volts)
+        async with self._lock:
+            await self._report()
 
+    async def _report(self) -> None:
+        if not self._handler:
+            return
+        now = time.monotonic()
+        if (
+            self._reported is None
+            or abs(self._volts - self._reported) >= self._HYSTERESIS
+            or now - self._reported_at >= self._MAX_REPORT_INTERVAL
+        ):
+            self._reported = self._volts
+            self._reported_at = now
+            await self._handler(self.status())
+
+    async def set_handler(self, h: Callable[[str], Awaitable[None]]) -> None:
         async with self._lock:
-            if self._task:
+            if self._handler:
                 _log.warning(
                     "attempted to set battery handler when one already exists",
                 )
                 return
-            self._task = asyncio.create_task(task())
+            self._handler = h
+            self._reported = None
+            await self._report()
 
     @override
     async def disconnect(self) -> None:
         async with self._lock:
-            if self._task:
-                self._task.cancel()
-                with suppress(asyncio.CancelledError):
-                    await self._task
-                self._task = None
+            self._handler = None
 
 
 class _TwoWayControl:
@@ -353,48 +653,174 @@ class _TwoWayControl:
             self.off()
 
 
+class _CoalescingWriter:
+    """Merges bursts of requests to write motor state into a single write.
+
+    Control values are updated as soon as commands arrive, but the motors are
+    only written once the burst has been handled, so each control only acts on
+    its newest value.
+    """
+
+    def __init__(self, name: str, write: Callable[[], None]) -> None:
+        super().__init__()
+        self._name = name
+        self._write = write
+        self._event = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._traces: list[latency.Trace] = []
+        self._pending = 0
+        self._requests = 0
+        self._merged = 0
+
+    @property
+    def requests(self) -> int:
+        return self._requests
+
+    @property
+    def merged(self) -> int:
+        return self._merged
+
+    def _absorb_pending(self) -> None:
+        if self._pending > 1:
+            self._merged += self._pending - 1
+        self._pending = 0
+        self._event.clear()
+
+    def request(self) -> None:
+        async def task() -> None:
+            while True:
+                await self._event.wait()
+                self.write_now()
+
+        trace = latency.current()
+        if trace:
+            trace.dispatched()
+            self._traces.append(trace)
+
+        self._pending += 1
+        self._requests += 1
+        self._event.set()
+        if not self._task:
+            # Not in the current context, or the task would carry the first
+            # command's trace forever
+            self._task = asyncio.create_task(
+                task(),
+                context=contextvars.Context(),
+            )
+
+    def write_now(self) -> None:
+        self._absorb_pending()
+        start = time.monotonic_ns()
+        self._write()
+        if self._traces:
+            end = time.monotonic_ns()
+            for trace in self._traces:
+                trace.written(start, end)
+            self._traces.clear()
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self._absorb_pending()
+        self._traces.clear()
+        _log.info(
+            f"{self._name}: merged {self._merged} of {self._requests} "
+            "movement commands",
+        )
+
+
 class _Drive(_Actor):
     _DRIVE_SPEED = -700
     _TURN_SPEED = -500
+    _TICK_INTERVAL = 0.1
+    # Stop if the driver hasn't said anything for this many ticks
+    _MAX_TICKS_SINCE_LAST = 75
 
-    def __init__(self) -> None:
+    def __init__(self, scheduler: Scheduler) -> None:
         super().__init__()
+        self._scheduler = scheduler
 
-        def init_wheel(port: str) -> ev3.LargeMotor:
+        def init_wheel(port: str) -> ev3.CachedMotor:
             wheel = ev3.large_motor(port)
             wheel.reset()
-            wheel.stop_action = Motor.STOP_ACTION_COAST
+            wheel.stop_action = ev3.STOP_ACTION_COAST
             return wheel
 
         self._left_wheel = init_wheel(_LEFT_WHEEL_PORT)
         self._right_wheel = init_wheel(_RIGHT_WHEEL_PORT)
-        self._touch_sensor = ev3.touch_sensor(_PLUNGER_PORT)
+        self._plunger = PlungerGuard(
+            ev3.touch_sensor(_PLUNGER_PORT),
+            self._plunger_pressed,
+        )
+        self._loop: asyncio.AbstractEventLoop | None = None
         self._drive_control = _TwoWayControl()
         self._turn_control = _TwoWayControl()
         self._ticks_since_last = 0
+        self._writer = _CoalescingWriter("drive", self._update_wheel_speeds)
         self._lock = asyncio.Lock()
-        self._task: asyncio.Task[None] | None = None
+        self._job: Job | None = None
         _log.info("created drive")
 
-    async def _init_background_task(self) -> None:
-        async def task() -> None:
-            while True:
-                self._ticks_since_last += 1
-                if (
-                    self._touch_sensor.is_pressed or self._ticks_since_last > 75  # noqa: PLR2004
-                ):
-                    self.stop()
-                await asyncio.sleep(0.1)
+    @override
+    async def __aenter__(self) -> Self:
+        self._loop = asyncio.get_running_loop()
+        self._plunger.start()
+        return self
+
+    @override
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await super().__aexit__(exc_type, exc_val, exc_tb)
+        await asyncio.to_thread(self._plunger.stop)
+        self._left_wheel.log_report()
+        self._right_wheel.log_report()
+
+    @override
+    def probes(self) -> dict[str, Probe]:
+        return {
+            "left_position": Probe(lambda: self._left_wheel.position, 1),
+            "left_speed": Probe(lambda: self._left_wheel.speed, 1),
+            "right_position": Probe(lambda: self._right_wheel.position, 1),
+            "right_speed": Probe(lambda: self._right_wheel.speed, 1),
+            "drive": Probe(lambda: self._drive_control.value, 100),
+            "turn": Probe(lambda: self._turn_control.value, 100),
+            "plunger": Probe(lambda: float(self._plunger.pressed), 1),
+        }
+
+    def _plunger_pressed(self) -> None:
+        # Called on the plunger's thread, so stop the wheels right away
+        # rather than waiting for the event loop, which then catches up
+        self._left_wheel.stop()
+        self._right_wheel.stop()
+        if self._loop:
+            self._loop.call_soon_threadsafe(self.stop)
+
+    def _tick(self) -> None:
+        self._ticks_since_last += 1
+        if self._ticks_since_last > self._MAX_TICKS_SINCE_LAST:
+            self.stop()
 
+    async def _init_background_task(self) -> None:
         self._ticks_since_last = 0
 
         async with self._lock:
-            if self._task:
+            if self._job:
                 return
-            self._task = asyncio.create_task(task())
+            self._job = self._scheduler.every(
+                "drive",
+                self._TICK_INTERVAL,
+                self._tick,
+            )
 
     def _update_wheel_speeds(self) -> None:
-        def set_wheel_speed(wheel: ev3.LargeMotor, speed: float) -> None:
+        def set_wheel_speed(wheel: ev3.CachedMotor, speed: float) -> None:
             wheel.speed_sp = speed
             if speed == 0.0:
                 wheel.stop()
@@ -403,6 +829,9 @@ class _Drive(_Actor):
 
         drive_part = self._DRIVE_SPEED * self._drive_control.value
         turn_part = self._TURN_SPEED * self._turn_control.value
+        if self._plunger.pressed:
+            # Don't drive on while it's held in
+            drive_part = turn_part = 0.0
 
         set_wheel_speed(self._left_wheel, drive_part + turn_part)
         set_wheel_speed(self._right_wheel, drive_part - turn_part)
@@ -414,7 +843,7 @@ class _Drive(_Actor):
     ) -> None:
         await self._init_background_task()
         control.press(value)
-        self._update_wheel_speeds()
+        self._writer.request()
 
     async def _control_release(
         self,
@@ -423,7 +852,7 @@ class _Drive(_Actor):
     ) -> None:
         await self._init_background_task()
         control.release(value)
-        self._update_wheel_speeds()
+        self._writer.request()
 
     async def drive(self, value: float) -> None:
         await self._control_press(self._drive_control, value)
@@ -441,17 +870,30 @@ class _Drive(_Actor):
         self._ticks_since_last = 0
         self._drive_control.off()
         self._turn_control.off()
-        self._update_wheel_speeds()
+        self._writer.write_now()
 
     @override
     async def disconnect(self) -> None:
         async with self._lock:
             self.stop()
-            if self._task:
-                self._task.cancel()
-                with suppress(asyncio.CancelledError):
-                    await self._task
-                self._task = None
+            await self._writer.close()
+            if self._job:
+                self._job.cancel()
+                self._job = None
+
+
+class HeadPreset(StrEnum):
+    LEFT = "left"
+    CENTER = "center"
+    RIGHT = "right"
+
+
+# In the same range as head_turn's values, so positive is to the right
+_HEAD_PRESETS = {
+    HeadPreset.LEFT: -1.0,
+    HeadPreset.CENTER: 0.0,
+    HeadPreset.RIGHT: 1.0,
+}
 
 
 class Head(_Actor):
@@ -462,115 +904,290 @@ class Head(_Actor):
         super().__init__()
         self._motor = ev3.medium_motor(_HEAD_PORT)
         self._control = _TwoWayControl()
-        self._lock = asyncio.Lock()
-        self._task: asyncio.Task[None] | None = None
+        # Where to move to, if moving to a position rather than at a speed
+        self._target: float | None = None
+        self._writer = _CoalescingWriter("head", self._update_motor)
 
         self._motor.reset()
         self._motor.position = 0
-        self._motor.stop_action = Motor.STOP_ACTION_BRAKE
+        self._motor.stop_action = ev3.STOP_ACTION_BRAKE
         self._motor.ramp_up_sp = 0
         self._motor.ramp_down_sp = 0
 
         _log.info("created head")
 
-    async def _init_background_task(self) -> None:
-        async def task() -> None:
-            while True:
-                if (
-                    self._control.value > 0
-                    and self._motor.position > self._HEAD_LIMIT
-                ) or (
-                    self._control.value < 0
-                    and self._motor.position < -self._HEAD_LIMIT
-                ):
-                    self.stop()
-                await asyncio.sleep(0.1)
-
-        async with self._lock:
-            if self._task:
-                return
-            self._task = asyncio.create_task(task())
+    @override
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await super().__aexit__(exc_type, exc_val, exc_tb)
+        self._motor.log_report()
 
-    def _update_motor_speed(self) -> None:
-        speed = self._control.value * self._HEAD_SPEED
-        self._motor.speed_sp = speed
-        if speed == 0:
-            self._motor.stop()
+    @override
+    def probes(self) -> dict[str, Probe]:
+        return {
+            "head_position": Probe(lambda: self._motor.position, 1),
+            "head_speed": Probe(lambda: self._motor.speed, 1),
+            "head": Probe(lambda: self._control.value, 100),
+        }
+
+    def _update_motor(self) -> None:
+        # Every move is to a position within the limits, which the motor
+        # stops at by itself; turning at a speed is a move to the limit
+        value = self._control.value
+        if self._target is not None:
+            # Held there, rather than just braked, so that it stays where
+            # it was put
+            self._motor.stop_action = ev3.STOP_ACTION_HOLD
+            speed = float(self._HEAD_SPEED)
+            position = self._target
+        elif value != 0:
+            self._motor.stop_action = ev3.STOP_ACTION_BRAKE
+            speed = abs(value) * self._HEAD_SPEED
+            position = self._HEAD_LIMIT if value > 0 else -self._HEAD_LIMIT
         else:
-            self._motor.run_forever()
+            self._motor.stop()
+            return
+        self._motor.speed_sp = speed
+        self._motor.position_sp = round(position)
+        self._motor.run_to_abs_pos()
 
     async def turn(self, value: float) -> None:
-        await self._init_background_task()
+        self._target = None
         self._control.press(value)
-        self._update_motor_speed()
+        self._writer.request()
 
     async def turn_release(self, value: float) -> None:
-        await self._init_background_task()
+        self._target = None
         self._control.release(value)
-        self._update_motor_speed()
+        self._writer.request()
+
+    async def turn_to(self, position: float) -> None:
+        """Move to a position from -1 (fully left) to 1 (fully right)."""
+        if not math.isfinite(position):
+            _log.warning(f"ignoring head position {position}")
+            return
+        self._control.off()
+        self._target = clamp_control_range(position) * self._HEAD_LIMIT
+        self._writer.request()
+
+    async def turn_to_preset(self, preset: HeadPreset) -> None:
+        await self.turn_to(_HEAD_PRESETS[preset])
 
     def stop(self) -> None:
+        self._target = None
         self._control.off()
-        self._update_motor_speed()
+        self._writer.write_now()
 
     @override
     async def disconnect(self) -> None:
-        async with self._lock:
-            self.stop()
-            if self._task:
-                self._task.cancel()
-                with suppress(asyncio.CancelledError):
-                    await self._task
-                self._task = None
+        self.stop()
+        await self._writer.close()
 
 
 class Dalek:
     """Main Dalek controller"""
 
-    def __init__(
+    _CREATE_TIMEOUT = 10.0
+
+    def __init__(  # noqa: PLR0913
         self,
         sound_dir: str,
         text_to_speech_command: str,
-        take_picture_command: str,
-        camera_output_file: str,
+        capture_command: Sequence[str] | None = None,
+        camera_device: str | None = "/dev/video0",
+        max_stream_fps: float = 10.0,
+        recorder: Recorder | None = None,
+        audio_sink: audio.Sink | None = None,
+        tts_cache: tts.Cache | None = None,
+        camera_rotation: int = 0,
+        *,
+        fast_start: bool = False,
     ) -> None:
         super().__init__()
 
-        self._leds = _Leds()
-        self._voice = _Voice(
-            sound_dir,
-            text_to_speech_command,
-            self._leds,
-        )
-        self._camera = _Camera(
-            take_picture_command,
-            camera_output_file,
+        self._sound_dir = sound_dir
+        self._text_to_speech_command = text_to_speech_command
+        self._capture_command = capture_command
+        self._camera_device = camera_device
+        self._max_stream_fps = max_stream_fps
+        self._recorder = recorder
+        self._audio_sink = audio_sink or audio.AplaySink()
+        self._tts_cache = tts_cache
+        self._camera_rotation = camera_rotation
+        self._fast_start = fast_start
+        # All periodic hardware work runs from here, rather than each actor
+        # having its own polling task
+        self._scheduler = Scheduler()
+        self._startup_times: dict[str, float] = {}
+
+        # Created by run(), since they can take a while
+        self._leds: _Leds
+        self._voice: _Voice
+        self._camera: _Camera
+        self._battery: _Battery
+        self._drive: _Drive
+        self._head: Head
+        self._telemetry: Telemetry
+
+    @property
+    def startup_times(self) -> dict[str, float]:
+        """How long each phase of startup took, in seconds."""
+        return dict(self._startup_times)
+
+    async def _create[T](self, name: str, create: Callable[[], T]) -> T:
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[T] = loop.create_future()
+
+        def resolve(set_result: Callable[[], None]) -> None:
+            if not future.done():
+                set_result()
+
+        def run() -> None:
+            try:
+                result = create()
+            except Exception as e:  # noqa: BLE001
+                settle = functools.partial(future.set_exception, e)
+            else:
+                settle = functools.partial(future.set_result, result)
+            # The loop is gone if this was given up on and everything has
+            # since shut down
+            with suppress(RuntimeError):
+                loop.call_soon_threadsafe(resolve, settle)
+
+        # In a thread, because creating actors does blocking hardware I/O;
+        # not the default executor's, because a hung one would stop the
+        # process exiting
+        threading.Thread(target=run, name=f"create {name}", daemon=True).start()
+        try:
+            result = await asyncio.wait_for(future, self._CREATE_TIMEOUT)
+        except TimeoutError:
+            _log.error(f"gave up creating {name} after {self._CREATE_TIMEOUT}s")
+            raise
+        self._startup_times[name] = time.monotonic() - start
+        return result
+
+    async def _create_actors(self) -> None:
+        start = time.monotonic()
+        # Choose the backend before the threads all want it
+        ev3.backend()
+        self._startup_times["backend"] = time.monotonic() - start
+
+        async def create_voice() -> _Voice:
+            # The LEDs take a second to set up, but only the voice needs them
+            self._leds = await self._create("leds", _Leds)
+            return await self._create(
+                "voice",
+                lambda: _Voice(
+                    self._sound_dir,
+                    self._text_to_speech_command,
+                    self._leds,
+                    self._audio_sink,
+                    self._tts_cache,
+                ),
+            )
+
+        tasks: list[asyncio.Task[_Actor]] = []
+        try:
+            async with asyncio.TaskGroup() as tg:
+                voice = tg.create_task(create_voice())
+                camera = tg.create_task(
+                    self._create(
+                        "camera",
+                        lambda: _Camera(
+                            self._capture_command,
+                            self._camera_device,
+                            self._max_stream_fps,
+                            self._camera_rotation,
+                        ),
+                    ),
+                )
+                battery = tg.create_task(
+                    self._create("battery", lambda: _Battery(self._scheduler)),
+                )
+                drive = tg.create_task(
+                    self._create("drive", lambda: _Drive(self._scheduler)),
+                )
+                head = tg.create_task(
+                    self._create("head", Head),
+                )
+                tasks = [voice, camera, battery, drive, head]
+        except BaseException:
+            # Leave the actors that were created stopped, as they would be
+            # after a normal exit
+            for task in tasks:
+                if (
+                    task.done()
+                    and not task.cancelled()
+                    and not task.exception()
+                ):
+                    await task.result().disconnect()
+            raise
+
+        self._voice = voice.result()
+        self._camera = camera.result()
+        self._battery = battery.result()
+        self._drive = drive.result()
+        self._head = head.result()
+        self._telemetry = Telemetry(
+            self._scheduler,
+            self._battery.probes() | self._drive.probes() | self._head.probes(),
         )
-        self._battery = _Battery()
-        self._drive = _Drive()
-        self._head = Head()
+        self._startup_times["actors"] = time.monotonic() - start
+
+    async def _awaken(self) -> None:
+        start = time.monotonic()
+        await self._voice.speak(Sounds.COMMENCE_AWAKENING)
+        await self._voice.wait()
+        await asyncio.sleep(1)
+        await self._voice.speak(Sounds.EXTERMINATE)
+        await self._voice.wait()
+        self._startup_times["awakening"] = time.monotonic() - start
+        _log.info(f"awakening took {self._startup_times['awakening']:.2f}s")
 
     @asynccontextmanager
     async def run(self) -> AsyncGenerator[Self]:
+        start = time.monotonic()
+        await self._create_actors()
+        awakening: asyncio.Task[None] | None = None
         try:
             async with (
+                self._scheduler,
                 self._voice,
                 self._camera,
                 self._battery,
                 self._drive,
                 self._head,
+                self._telemetry,
             ):
-                await self._voice.speak(Sounds.COMMENCE_AWAKENING)
-                await self._voice.wait()
-                await asyncio.sleep(1)
-                await self._voice.speak(Sounds.EXTERMINATE)
-                await self._voice.wait()
-
-                _log.info("ready")
+                # Ready as soon as the actors are; the awakening sequence is
+                # just for show, so it plays while clients connect
+                if not self._fast_start:
+                    awakening = asyncio.create_task(self._awaken())
+                self._startup_times["ready"] = time.monotonic() - start
+                _log.info(
+                    "ready; startup took "
+                    + ", ".join(
+                        f"{name} {t:.2f}s"
+                        for name, t in self._startup_times.items()
+                    ),
+                )
                 yield self
         finally:
-            await self._voice.speak(Sounds.STATUS_HIBERNATION)
-            await self._voice.disconnect()
+            if awakening:
+                awakening.cancel()
+                with suppress(asyncio.CancelledError):
+                    await awakening
+            await self._voice.speak(
+                Sounds.STATUS_HIBERNATION,
+                SpeechPolicy.REPLACE,
+                SpeechPriority.LIFECYCLE,
+            )
+            await self._voice.close()
 
     async def disconnect(self) -> None:
         await self._voice.disconnect()
@@ -579,37 +1196,73 @@ class Dalek:
         await self._drive.disconnect()
         await self._head.disconnect()
 
+    def _record(self, op: Op, arg: float | str | None = None) -> None:
+        if self._recorder:
+            self._recorder.record(op, arg)
+
+    async def disconnect_driver(self) -> None:
+        await self._voice.disconnect()
+        await self._camera.stop_stream()
+        await self._drive.disconnect()
+        await self._head.disconnect()
+
     async def drive(self, value: float) -> None:
+        self._record(Op.DRIVE, value)
         await self._drive.drive(value)
 
     async def drive_release(self, value: float) -> None:
+        self._record(Op.DRIVE_RELEASE, value)
         await self._drive.drive_release(value)
 
     async def turn(self, value: float) -> None:
+        self._record(Op.TURN, value)
         await self._drive.turn(value)
 
     async def turn_release(self, value: float) -> None:
+        self._record(Op.TURN_RELEASE, value)
         await self._drive.turn_release(value)
 
     async def head_turn(self, value: float) -> None:
+        self._record(Op.HEAD_TURN, value)
         await self._head.turn(value)
 
     async def head_turn_release(self, value: float) -> None:
+        self._record(Op.HEAD_TURN_RELEASE, value)
         await self._head.turn_release(value)
 
+    async def head_to(self, position: float) -> None:
+        self._record(Op.HEAD_TO, position)
+        await self._head.turn_to(position)
+
+    async def head_to_preset(self, preset: HeadPreset) -> None:
+        self._record(Op.HEAD_TO_PRESET, preset)
+        await self._head.turn_to_preset(preset)
+
     def stop_moving(self) -> None:
+        self._record(Op.STOP_MOVING)
         self._drive.stop()
         self._head.stop()
 
     def toggle_lights(self) -> None:
+        self._record(Op.TOGGLE_LIGHTS)
         self._leds.toggle()
 
-    async def speak(self, text: str) -> None:
-        await self._voice.speak(text)
+    async def speak(
+        self,
+        text: str,
+        policy: SpeechPolicy = SpeechPolicy.QUEUE,
+    ) -> None:
+        self._record(Op.SPEAK, text)
+        await self._voice.speak(text, policy)
 
     async def stop_speaking(self) -> None:
+        self._record(Op.STOP_SPEAKING)
         await self._voice.stop()
 
+    @property
+    def camera_rotation(self) -> int:
+        return self._camera.rotation
+
     async def set_camera_handler(
         self,
         h: Callable[[bytes], Awaitable[None]],
@@ -617,11 +1270,28 @@ class Dalek:
         await self._camera.set_handler(h)
 
     async def take_picture(self) -> None:
+        self._record(Op.TAKE_PICTURE)
         await self._camera.take_picture()
 
+    async def start_stream(self, fps: float) -> None:
+        self._record(Op.START_STREAM, fps)
+        await self._camera.start_stream(fps)
+
+    async def stop_stream(self) -> None:
+        self._record(Op.STOP_STREAM)
+        await self._camera.stop_stream()
+
     def battery_status(self) -> str:
         return self._battery.status()
 
+    def battery_history(self) -> tuple[float, list[float]]:
+        """Seconds between samples, and the samples, oldest first."""
+        return self._battery.history_interval, self._battery.history()
+
+    @property
+    def telemetry(self) -> Telemetry:
+        return self._telemetry
+
     async def set_battery_handler(
         self,
         h: Callable[[str], Awaitable[None]],
@@ -1,22 +1,91 @@
-"""Shims for selecting between real and fake ev3 classes."""
+"""Shims for selecting between real and fake ev3 classes.
 
-from typing import Protocol
+The backend is chosen once, the first time a device is created: from
+use(), the DALEK_EV3_BACKEND environment variable, or by checking whether
+this is an ev3dev brick. Only the chosen backend's modules are imported.
+A backend is a module with the same device functions as this one, so
+other backends can be added with register(), or named by module.
+"""
 
-import ev3dev2.led
-import ev3dev2.motor
-import ev3dev2.port
-import ev3dev2.power
-import ev3dev2.sensor.lego
+import importlib
+import logging
+import os
+import threading
+from collections.abc import Callable
+from typing import Protocol, cast
 
-import dalek.fake_ev3
+_log = logging.getLogger(__name__)
 
+# Port names on the EV3 brick, as ev3dev2 gives them
+OUTPUT_A = "ev3-ports:outA"
+OUTPUT_B = "ev3-ports:outB"
+OUTPUT_C = "ev3-ports:outC"
+OUTPUT_D = "ev3-ports:outD"
+INPUT_1 = "ev3-ports:in1"
+INPUT_2 = "ev3-ports:in2"
+INPUT_3 = "ev3-ports:in3"
+INPUT_4 = "ev3-ports:in4"
 
-def is_real_ev3() -> bool:
+STOP_ACTION_COAST = "coast"
+STOP_ACTION_BRAKE = "brake"
+STOP_ACTION_HOLD = "hold"
+
+BACKEND_ENV = "DALEK_EV3_BACKEND"
+
+_backends = {
+    "ev3dev": "dalek.ev3dev_backend",
+    "fake": "dalek.fake_ev3",
+}
+_forced: str | None = None
+_backend: "Backend | None" = None
+_backend_name: str | None = None
+
+
+def register(name: str, module: str) -> None:
+    """Make a backend available by name; the module is imported if used."""
+    _backends[name] = module
+
+
+def backends() -> list[str]:
+    return sorted(_backends)
+
+
+def use(name: str) -> None:
+    """Force a backend, which must be done before any device is created."""
+    global _forced  # noqa: PLW0603
+    if _backend_name is not None and _backend_name != name:
+        msg = f"can't use ev3 backend '{name}', already using '{_backend_name}'"
+        raise ValueError(msg)
+    _forced = name
+
+
+def _detect() -> str:
     try:
         with open("/etc/os-release") as f:
-            return "ev3dev" in f.read()
+            return "ev3dev" if "ev3dev" in f.read() else "fake"
     except OSError:
-        return False
+        return "fake"
+
+
+def backend_name() -> str:
+    if _backend_name is not None:
+        return _backend_name
+    return _forced or os.getenv(BACKEND_ENV) or _detect()
+
+
+def backend() -> "Backend":
+    global _backend, _backend_name  # noqa: PLW0603
+    if _backend is None:
+        name = backend_name()
+        module = importlib.import_module(_backends.get(name, name))
+        _backend = cast("Backend", module)
+        _backend_name = name
+        _log.info(f"using ev3 backend '{name}'")
+    return _backend
+
+
+def is_real_ev3() -> bool:
+    return backend_name() == "ev3dev"
 
 
 class LegoPort(Protocol):
@@ -24,9 +93,7 @@ class LegoPort(Protocol):
 
 
 def lego_port(address: str) -> LegoPort:
-    if is_real_ev3():
-        return ev3dev2.port.LegoPort(address)
-    return dalek.fake_ev3.LegoPort(address)
+    return backend().lego_port(address)
 
 
 class Led(Protocol):
@@ -37,9 +104,7 @@ class Led(Protocol):
 
 
 def led(name_pattern: str) -> Led:
-    if is_real_ev3():
-        return ev3dev2.led.Led(name_pattern)
-    return dalek.fake_ev3.Led(name_pattern)
+    return backend().led(name_pattern)
 
 
 class PowerSupply(Protocol):
@@ -48,9 +113,7 @@ class PowerSupply(Protocol):
 
 
 def power_supply() -> PowerSupply:
-    if is_real_ev3():
-        return ev3dev2.power.PowerSupply()
-    return dalek.fake_ev3.PowerSupply()
+    return backend().power_supply()
 
 
 class Motor(Protocol):
@@ -59,28 +122,164 @@ class Motor(Protocol):
     speed_sp: float
     ramp_up_sp: float
     ramp_down_sp: float
+    position_sp: float
+
+    @property
+    def speed(self) -> float: ...
 
     def reset(self) -> None: ...
     def stop(self) -> None: ...
     def run_forever(self) -> None: ...
+    def run_to_abs_pos(self) -> None: ...
+
+
+class CachedMotor:
+    """Skips motor writes that wouldn't change anything.
+
+    Every attribute write and command is a sysfs write on the brick. This
+    remembers the last value written to each attribute, and the last
+    command sent, so repeating them costs nothing.
+    Changing any attribute means the next command is sent again, since
+    that's when the motor picks up the change. Position and speed aren't
+    cached, because the motor changes them itself.
+
+    It's safe to use from more than one thread.
+    """
+
+    def __init__(self, motor: Motor, address: str) -> None:
+        super().__init__()
+        self._motor = motor
+        self._address = address
+        self._values: dict[str, float | str] = {}
+        # None if unknown, or if an attribute has changed since it was sent
+        self._command: str | None = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def _set(self, name: str, value: float | str) -> None:
+        with self._lock:
+            if self._values.get(name) == value:
+                self._hits += 1
+                return
+            setattr(self._motor, name, value)
+            self._values[name] = value
+            self._command = None
+            self._misses += 1
+
+    def _get(self, name: str) -> float | str:
+        with self._lock:
+            if name not in self._values:
+                self._values[name] = getattr(self._motor, name)
+            return self._values[name]
+
+    @property
+    def stop_action(self) -> str:
+        return str(self._get("stop_action"))
+
+    @stop_action.setter
+    def stop_action(self, a: str) -> None:
+        self._set("stop_action", a)
+
+    @property
+    def position(self) -> float:
+        return self._motor.position
+
+    @position.setter
+    def position(self, p: float) -> None:
+        self._motor.position = p
+
+    @property
+    def speed(self) -> float:
+        return self._motor.speed
+
+    @property
+    def speed_sp(self) -> float:
+        return float(self._get("speed_sp"))
+
+    @speed_sp.setter
+    def speed_sp(self, s: float) -> None:
+        self._set("speed_sp", s)
+
+    @property
+    def ramp_up_sp(self) -> float:
+        return float(self._get("ramp_up_sp"))
+
+    @ramp_up_sp.setter
+    def ramp_up_sp(self, r: float) -> None:
+        self._set("ramp_up_sp", r)
+
+    @property
+    def ramp_down_sp(self) -> float:
+        return float(self._get("ramp_down_sp"))
+
+    @ramp_down_sp.setter
+    def ramp_down_sp(self, r: float) -> None:
+        self._set("ramp_down_sp", r)
+
+    @property
+    def position_sp(self) -> float:
+        return float(self._get("position_sp"))
+
+    @position_sp.setter
+    def position_sp(self, p: float) -> None:
+        self._set("position_sp", p)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._motor.reset()
+            # Resetting puts the attributes back to their defaults, and
+            # stops the motor
+            self._values.clear()
+            self._command = "stop"
+            self._misses += 1
+
+    def _send(self, command: str, send: Callable[[], None]) -> None:
+        with self._lock:
+            if self._command == command:
+                self._hits += 1
+                return
+            send()
+            self._command = command
+            self._misses += 1
+
+    def stop(self) -> None:
+        self._send("stop", self._motor.stop)
+
+    def run_forever(self) -> None:
+        self._send("run-forever", self._motor.run_forever)
+
+    def run_to_abs_pos(self) -> None:
+        """Run to position_sp, where the motor stops itself."""
+        self._send("run-to-abs-pos", self._motor.run_to_abs_pos)
+
+    def log_report(self) -> None:
+        _log.info(
+            f"motor {self._address}: {self._misses} writes, "
+            f"{self._hits} skipped",
+        )
 
 
 class LargeMotor(Motor, Protocol): ...
 
 
-def large_motor(address: str) -> LargeMotor:
-    if is_real_ev3():
-        return ev3dev2.motor.LargeMotor(address)
-    return dalek.fake_ev3.LargeMotor(address)
+def large_motor(address: str) -> CachedMotor:
+    return CachedMotor(backend().large_motor(address), address)
 
 
 class MediumMotor(Motor, Protocol): ...
 
 
-def medium_motor(address: str) -> MediumMotor:
-    if is_real_ev3():
-        return ev3dev2.motor.MediumMotor(address)
-    return dalek.fake_ev3.MediumMotor(address)
+def medium_motor(address: str) -> CachedMotor:
+    return CachedMotor(backend().medium_motor(address), address)
 
 
 class TouchSensor(Protocol):
@@ -89,6 +288,13 @@ class TouchSensor(Protocol):
 
 
 def touch_sensor(address: str) -> TouchSensor:
-    if is_real_ev3():
-        return ev3dev2.sensor.lego.TouchSensor(address)
-    return dalek.fake_ev3.TouchSensor(address)
+    return backend().touch_sensor(address)
+
+
+class Backend(Protocol):
+    def lego_port(self, address: str) -> LegoPort: ...
+    def led(self, name_pattern: str) -> Led: ...
+    def power_supply(self) -> PowerSupply: ...
+    def large_motor(self, address: str) -> LargeMotor: ...
+    def medium_motor(self, address: str) -> MediumMotor: ...
+    def touch_sensor(self, address: str) -> TouchSensor: ...
@@ -0,0 +1,31 @@
+"""ev3 backend for a real brick, using ev3dev2."""
+
+import ev3dev2.led
+import ev3dev2.motor
+import ev3dev2.port
+import ev3dev2.power
+import ev3dev2.sensor.lego
+
+
+def lego_port(address: str) -> ev3dev2.port.LegoPort:
+    return ev3dev2.port.LegoPort(address)
+
+
+def led(name_pattern: str) -> ev3dev2.led.Led:
+    return ev3dev2.led.Led(name_pattern)
+
+
+def power_supply() -> ev3dev2.power.PowerSupply:
+    return ev3dev2.power.PowerSupply()
+
+
+def large_motor(address: str) -> ev3dev2.motor.LargeMotor:
+    return ev3dev2.motor.LargeMotor(address)
+
+
+def medium_motor(address: str) -> ev3dev2.motor.MediumMotor:
+    return ev3dev2.motor.MediumMotor(address)
+
+
+def touch_sensor(address: str) -> ev3dev2.sensor.lego.TouchSensor:
+    return ev3dev2.sensor.lego.TouchSensor(address)
@@ -0,0 +1,55 @@
+"""Fake camera, for testing without a capture device.
+
+Run as 'python -m dalek.fake_capture FPS [DEVICE]'; writes a placeholder
+JPEG to stdout FPS times a second, like utils/stream_camera.sh does with a
+real camera. Each frame has its number in a comment segment.
+"""
+
+import struct
+import sys
+import time
+
+# An 8x8 grey image
+_JPEG = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300100b0c0e0c0a100e0d0e"
+    "1211101318281a181616183123251d283a333d3c3933383740485c4e40445745373850"
+    "6d51575f626768673e4d71797064785c656763ffc0000b080008000801011100ffc400"
+    "1f0000010501010101010100000000000000000102030405060708090a0bffc400b510"
+    "0002010303020403050504040000017d01020300041105122131410613516107227114"
+    "328191a1082342b1c11552d1f02433627282090a161718191a25262728292a34353637"
+    "38393a434445464748494a535455565758595a636465666768696a737475767778797a"
+    "838485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9ba"
+    "c2c3c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7"
+    "f8f9faffda0008010100003f002bffd9",
+)
+
+_COM = b"\xff\xfe"
+
+
+def frame(n: int) -> bytes:
+    comment = f"frame {n}".encode()
+    return (
+        _JPEG[:2]
+        + _COM
+        + struct.pack("!H", len(comment) + 2)
+        + comment
+        + _JPEG[2:]
+    )
+
+
+def main() -> None:
+    fps = float(sys.argv[1])
+    start = time.monotonic()
+    n = 0
+    try:
+        while True:
+            sys.stdout.buffer.write(frame(n))
+            sys.stdout.buffer.flush()
+            n += 1
+            time.sleep(max(start + n / fps - time.monotonic(), 0.0))
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+
+
+if __name__ == "__main__":
+    main()
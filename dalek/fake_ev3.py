@@ -1,4 +1,4 @@
-"""Fake versions of some ev3dev classes, for testing."""
+"""ev3 backend with fake versions of some ev3dev classes, for testing."""
 
 import logging
 
@@ -14,6 +14,8 @@ class Motor:
         self._speed_sp = 0.0
         self._ramp_up_sp = 0.0
         self._ramp_down_sp = 0.0
+        self._position_sp = 0.0
+        self._speed = 0.0
 
     @property
     def stop_action(self) -> str:
@@ -31,6 +33,10 @@ class Motor:
     def position(self, p: float) -> None:
         self._position = p
 
+    @property
+    def speed(self) -> float:
+        return self._speed
+
     @property
     def speed_sp(self) -> float:
         return self._speed_sp
@@ -56,15 +62,31 @@ class Motor:
     def ramp_down_sp(self, r: float) -> None:
         self._ramp_down_sp = r
 
+    @property
+    def position_sp(self) -> float:
+        return self._position_sp
+
+    @position_sp.setter
+    def position_sp(self, p: float) -> None:
+        self._position_sp = p
+        self._msg(f"position_sp {self._position_sp}")
+
     def reset(self) -> None:
         self._msg("reset")
 
     def stop(self) -> None:
+        self._speed = 0.0
         self._msg("stop")
 
     def run_forever(self) -> None:
+        self._speed = self._speed_sp
         self._msg("run_forever")
 
+    def run_to_abs_pos(self) -> None:
+        # Arrives instantly
+        self._position = self._position_sp
+        self._msg("run_to_abs_pos")
+
     def _msg(self, s: str) -> None:
         _LOG.info(f"[{self.__class__.__name__} {self._address}] {s}")
 
@@ -125,3 +147,27 @@ class Led:
         _LOG.info(
             f"[LEDs {self._name_pattern}] brightness {self._brightness}",
         )
+
+
+def lego_port(address: str) -> LegoPort:
+    return LegoPort(address)
+
+
+def led(name_pattern: str) -> Led:
+    return Led(name_pattern)
+
+
+def power_supply() -> PowerSupply:
+    return PowerSupply()
+
+
+def large_motor(address: str) -> LargeMotor:
+    return LargeMotor(address)
+
+
+def medium_motor(address: str) -> MediumMotor:
+    return MediumMotor(address)
+
+
+def touch_sensor(address: str) -> TouchSensor:
+    return TouchSensor(address)
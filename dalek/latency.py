@@ -0,0 +1,207 @@
+"""Per-command latency tracing."""
+
+import logging
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import StrEnum
+
+_log = logging.getLogger(__name__)
+
+
+class Source(StrEnum):
+    WEBSOCKET = "websocket"
+    GAMEPAD = "gamepad"
+
+
+class Stage(StrEnum):
+    # Arrival to parsed
+    PARSE = "parse"
+    # Parsed to reaching the actor, e.g. waiting for locks
+    DISPATCH = "dispatch"
+    # Reaching the actor to starting the motor write, e.g. coalescing
+    QUEUE = "queue"
+    # The motor write itself, i.e. sysfs I/O
+    WRITE = "write"
+    # Arrival to fully handled
+    TOTAL = "total"
+
+
+class Histogram:
+    """Histogram of durations, with power-of-two microsecond buckets."""
+
+    _NUM_BUCKETS = 26
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._buckets = [0] * self._NUM_BUCKETS
+        self._count = 0
+        self._total_ns = 0
+        self._max_ns = 0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def max_ns(self) -> int:
+        return self._max_ns
+
+    @property
+    def mean_ns(self) -> float:
+        return self._total_ns / self._count if self._count else 0.0
+
+    def record(self, duration_ns: int) -> None:
+        duration_ns = max(duration_ns, 0)
+        bucket = (duration_ns // 1000).bit_length()
+        self._buckets[min(bucket, self._NUM_BUCKETS - 1)] += 1
+        self._count += 1
+        self._total_ns += duration_ns
+        self._max_ns = max(self._max_ns, duration_ns)
+
+    def merge(self, other: "Histogram") -> None:
+        for i, n in enumerate(other._buckets):  # noqa: SLF001
+            self._buckets[i] += n
+        self._count += other._count  # noqa: SLF001
+        self._total_ns += other._total_ns  # noqa: SLF001
+        self._max_ns = max(self._max_ns, other._max_ns)  # noqa: SLF001
+
+    def percentile_ns(self, p: float) -> int:
+        """Upper bound of the bucket containing the p-th percentile."""
+        if not self._count:
+            return 0
+        target = p / 100.0 * self._count
+        seen = 0
+        for bucket, n in enumerate(self._buckets):
+            seen += n
+            if seen >= target:
+                return min((1 << bucket) * 1000, self._max_ns)
+        return self._max_ns
+
+    def __str__(self) -> str:
+        return (
+            f"n={self._count} "
+            f"mean={self.mean_ns / 1e6:.2f}ms "
+            f"p50={self.percentile_ns(50) / 1e6:.2f}ms "
+            f"p99={self.percentile_ns(99) / 1e6:.2f}ms "
+            f"max={self._max_ns / 1e6:.2f}ms"
+        )
+
+
+_histograms: dict[tuple[Source, str, Stage], Histogram] = {}
+
+
+def _record(source: Source, command: str, stage: Stage, ns: int) -> None:
+    key = (source, command, stage)
+    h = _histograms.get(key)
+    if h is None:
+        h = _histograms[key] = Histogram()
+    h.record(ns)
+
+
+def histograms() -> dict[tuple[Source, str, Stage], Histogram]:
+    return dict(_histograms)
+
+
+def reset() -> None:
+    _histograms.clear()
+
+
+def log_report() -> None:
+    for (source, command, stage), h in sorted(_histograms.items()):
+        _log.info(f"latency {source} '{command}' {stage}: {h}")
+
+
+class Trace:
+    """Records when a command arrived, was parsed, reached an actor, and was
+    written to the motors."""
+
+    __slots__ = ("_command", "_dispatched", "_parsed", "_received", "_source")
+
+    def __init__(self, source: Source, received_ns: int | None = None) -> None:
+        super().__init__()
+        self._source = source
+        self._received = (
+            time.monotonic_ns() if received_ns is None else received_ns
+        )
+        self._command: str | None = None
+        self._parsed = 0
+        self._dispatched = 0
+
+    @property
+    def source(self) -> Source:
+        return self._source
+
+    @property
+    def received_ns(self) -> int:
+        return self._received
+
+    def parsed(self, command: str) -> None:
+        self._command = command
+        self._parsed = time.monotonic_ns()
+        _record(
+            self._source,
+            command,
+            Stage.PARSE,
+            self._parsed - self._received,
+        )
+
+    def dispatched(self) -> None:
+        """The command reached an actor, and is finished when it's written."""
+        if self._command is not None and not self._dispatched:
+            self._dispatched = time.monotonic_ns()
+            _record(
+                self._source,
+                self._command,
+                Stage.DISPATCH,
+                self._dispatched - self._parsed,
+            )
+
+    def written(self, start_ns: int, end_ns: int) -> None:
+        if self._command is not None and self._dispatched:
+            _record(
+                self._source,
+                self._command,
+                Stage.QUEUE,
+                start_ns - self._dispatched,
+            )
+            _record(self._source, self._command, Stage.WRITE, end_ns - start_ns)
+            _record(
+                self._source,
+                self._command,
+                Stage.TOTAL,
+                end_ns - self._received,
+            )
+
+    def handled(self) -> None:
+        """The input layer is done; finishes commands that don't write."""
+        if self._command is not None and not self._dispatched:
+            _record(
+                self._source,
+                self._command,
+                Stage.TOTAL,
+                time.monotonic_ns() - self._received,
+            )
+
+
+_current: ContextVar[Trace | None] = ContextVar("_current", default=None)
+
+
+def current() -> Trace | None:
+    return _current.get()
+
+
+@contextmanager
+def tracing(trace: Trace) -> Iterator[Trace]:
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        trace.handled()
+
+
+def from_wall_clock(timestamp_ns: int) -> int:
+    """Convert a wall-clock timestamp, e.g. from evdev, to monotonic time."""
+    return time.monotonic_ns() - (time.time_ns() - timestamp_ns)
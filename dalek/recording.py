@@ -0,0 +1,144 @@
+"""Recording of inbound commands, for replaying later."""
+
+import logging
+import struct
+import time
+from collections.abc import Iterator
+from enum import IntEnum
+from types import TracebackType
+from typing import BinaryIO, NamedTuple, Self
+
+from dalek import latency
+
+_log = logging.getLogger(__name__)
+
+_MAGIC = b"DALEKREC\x01"
+
+# Time since the start of the recording in seconds, source, op, length of the
+# argument that follows
+_RECORD_HEADER = struct.Struct("<dBBH")
+_FLOAT_ARG = struct.Struct("<f")
+
+_SOURCES = list(latency.Source)
+
+
+class Op(IntEnum):
+    DRIVE = 1
+    DRIVE_RELEASE = 2
+    TURN = 3
+    TURN_RELEASE = 4
+    HEAD_TURN = 5
+    HEAD_TURN_RELEASE = 6
+    STOP_MOVING = 7
+    TOGGLE_LIGHTS = 8
+    SPEAK = 9
+    STOP_SPEAKING = 10
+    TAKE_PICTURE = 11
+    START_STREAM = 12
+    STOP_STREAM = 13
+    HEAD_TO = 14
+    HEAD_TO_PRESET = 15
+
+
+_FLOAT_OPS = frozenset(
+    {
+        Op.DRIVE,
+        Op.DRIVE_RELEASE,
+        Op.TURN,
+        Op.TURN_RELEASE,
+        Op.HEAD_TURN,
+        Op.HEAD_TURN_RELEASE,
+        Op.HEAD_TO,
+        Op.START_STREAM,
+    },
+)
+_STR_OPS = frozenset({Op.SPEAK, Op.HEAD_TO_PRESET})
+
+
+class Record(NamedTuple):
+    time: float
+    source: latency.Source
+    op: Op
+    arg: float | str | None
+
+
+class Recorder:
+    """Writes every inbound command to a file.
+
+    Only commands that arrive while a latency trace is active are recorded,
+    which is exactly the commands from the network and the gamepad; the trace
+    also provides the arrival time and source.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self._path = path
+        self._file: BinaryIO | None = None
+        self._start = 0
+        self._count = 0
+
+    def __enter__(self) -> Self:
+        self._file = open(self._path, "wb")
+        self._file.write(_MAGIC)
+        self._start = time.monotonic_ns()
+        self._count = 0
+        _log.info(f"recording to {self._path}")
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+            _log.info(f"recorded {self._count} commands to {self._path}")
+
+    def record(self, op: Op, arg: float | str | None = None) -> None:
+        trace = latency.current()
+        if not self._file or not trace:
+            return
+
+        if op in _FLOAT_OPS:
+            data = _FLOAT_ARG.pack(float(arg or 0.0))
+        elif op in _STR_OPS:
+            data = str(arg).encode("utf-8")[:0xFFFF]
+        else:
+            data = b""
+
+        self._file.write(
+            _RECORD_HEADER.pack(
+                (trace.received_ns - self._start) / 1e9,
+                _SOURCES.index(trace.source),
+                op,
+                len(data),
+            ),
+        )
+        self._file.write(data)
+        self._count += 1
+
+
+def read(path: str) -> Iterator[Record]:
+    with open(path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            _log.error(f"{path} is not a recording")
+            return
+
+        while header := f.read(_RECORD_HEADER.size):
+            if len(header) < _RECORD_HEADER.size:
+                _log.warning(f"{path} is truncated")
+                return
+            t, source, op, length = _RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                _log.warning(f"{path} is truncated")
+                return
+
+            arg: float | str | None = None
+            if op in _FLOAT_OPS:
+                (arg,) = _FLOAT_ARG.unpack(data)
+            elif op in _STR_OPS:
+                arg = data.decode("utf-8", errors="replace")
+            yield Record(t, _SOURCES[source], Op(op), arg)
@@ -0,0 +1,137 @@
+"""Replays a recorded session against the fake ev3 backend."""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+
+from dalek import audio, ev3, latency
+from dalek.dalek import Dalek, HeadPreset
+from dalek.recording import Op, Record, read
+
+_log = logging.getLogger(__name__)
+
+
+# Names used for latency tracing; matches the websocket commands
+_LABELS = {
+    Op.DRIVE: "begin drive",
+    Op.DRIVE_RELEASE: "release drive",
+    Op.TURN: "begin turn",
+    Op.TURN_RELEASE: "release turn",
+    Op.HEAD_TURN: "begin headturn",
+    Op.HEAD_TURN_RELEASE: "release headturn",
+    Op.HEAD_TO: "headto",
+    Op.HEAD_TO_PRESET: "headto",
+    Op.STOP_MOVING: "stop",
+    Op.TOGGLE_LIGHTS: "togglelights",
+    Op.SPEAK: "playsound",
+    Op.STOP_SPEAKING: "stopsound",
+    Op.TAKE_PICTURE: "snapshot",
+    Op.START_STREAM: "stream",
+    Op.STOP_STREAM: "stream",
+}
+
+
+def _ops(dalek: Dalek) -> dict[Op, Callable[..., Awaitable[None] | None]]:
+    return {
+        Op.DRIVE: dalek.drive,
+        Op.DRIVE_RELEASE: dalek.drive_release,
+        Op.TURN: dalek.turn,
+        Op.TURN_RELEASE: dalek.turn_release,
+        Op.HEAD_TURN: dalek.head_turn,
+        Op.HEAD_TURN_RELEASE: dalek.head_turn_release,
+        Op.HEAD_TO: dalek.head_to,
+        Op.HEAD_TO_PRESET: lambda p: dalek.head_to_preset(HeadPreset(p)),
+        Op.STOP_MOVING: dalek.stop_moving,
+        Op.TOGGLE_LIGHTS: dalek.toggle_lights,
+        Op.SPEAK: dalek.speak,
+        Op.STOP_SPEAKING: dalek.stop_speaking,
+        Op.TAKE_PICTURE: dalek.take_picture,
+        Op.START_STREAM: dalek.start_stream,
+        Op.STOP_STREAM: dalek.stop_stream,
+    }
+
+
+async def replay(dalek: Dalek, records: list[Record], speed: float) -> None:
+    """Feed records into dalek; speed 0 means as fast as possible."""
+    ops = _ops(dalek)
+    start = time.monotonic()
+
+    for record in records:
+        if speed > 0:
+            delay = start + record.time / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        trace = latency.Trace(record.source)
+        trace.parsed(_LABELS[record.op])
+        with latency.tracing(trace):
+            args = () if record.arg is None else (record.arg,)
+            result = ops[record.op](*args)
+            if result is not None:
+                await result
+
+        # Give background tasks, e.g. motor writes, a chance to run
+        await asyncio.sleep(0)
+
+    elapsed = time.monotonic() - start
+    _log.info(
+        f"replayed {len(records)} commands in {elapsed:.2f}s "
+        f"({len(records) / elapsed if elapsed else 0:.0f} commands/s)",
+    )
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(
+        description="Replay a session recorded with 'dalek --record'",
+    )
+    parser.add_argument("recording", help="Recording to replay")
+    speed = parser.add_mutually_exclusive_group()
+    speed.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Playback speed relative to real time",
+    )
+    speed.add_argument(
+        "--fast",
+        action="store_true",
+        help="Replay as fast as possible",
+    )
+    parser.add_argument(
+        "--sound-dir",
+        help="Directory containing sound files; none are played by default",
+    )
+    parser.add_argument(
+        "--audio-sink",
+        default="null",
+        type=audio.sink,
+        help="Where to play sounds: 'aplay', 'null', or 'file:PATH'",
+    )
+    args = parser.parse_args()
+
+    # Replaying mustn't drive the real motors, even on the brick
+    ev3.use("fake")
+
+    records = list(read(args.recording))
+    _log.info(f"loaded {len(records)} commands from {args.recording}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        async with Dalek(
+            args.sound_dir or tmp,
+            "true",
+            audio_sink=args.audio_sink,
+            fast_start=True,
+        ).run() as dalek:
+            latency.reset()
+            await replay(dalek, records, 0.0 if args.fast else args.speed)
+            await dalek.disconnect()
+            latency.log_report()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""Safety stops that mustn't wait for the event loop."""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+
+from dalek import ev3
+from dalek.latency import Histogram
+
+_log = logging.getLogger(__name__)
+
+
+class PlungerGuard:
+    """Watches the plunger's touch sensor from its own thread.
+
+    The sensor's sysfs value can't be waited on, so it's polled, but much
+    faster than the event loop could manage and regardless of how busy the
+    loop is. on_press is called on the guard's thread as soon as a press is
+    seen, and must be thread-safe.
+    """
+
+    _POLL_INTERVAL = 0.005
+
+    def __init__(
+        self,
+        sensor: ev3.TouchSensor,
+        on_press: Callable[[], None],
+    ) -> None:
+        super().__init__()
+        self._sensor = sensor
+        self._on_press = on_press
+        self._pressed = False
+        self._failing = False
+        self._presses = 0
+        self._latency = Histogram()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def pressed(self) -> bool:
+        return self._pressed
+
+    @property
+    def presses(self) -> int:
+        return self._presses
+
+    @property
+    def latency(self) -> Histogram:
+        """From seeing a press to on_press returning.
+
+        The press itself happened up to one poll interval earlier.
+        """
+        return self._latency
+
+    def start(self) -> None:
+        if self._thread:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="plunger",
+            daemon=True,
+        )
+        self._thread.start()
+        _log.info(f"watching plunger every {self._POLL_INTERVAL * 1e3:g}ms")
+
+    def stop(self) -> None:
+        if self._thread:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+            self.log_report()
+
+    def _poll(self) -> None:
+        try:
+            pressed = self._sensor.is_pressed
+        except Exception as e:  # noqa: BLE001
+            # An unplugged sensor raises ev3dev2's DeviceNotFound, not just
+            # OSError; either way, logged once rather than on every poll
+            if not self._failing:
+                _log.error(f"failed to read plunger: {e!r}")
+                self._failing = True
+            return
+        self._failing = False
+
+        if pressed and not self._pressed:
+            seen = time.monotonic_ns()
+            # Marked pressed first, so that nothing on another thread starts
+            # the wheels again while on_press is stopping them
+            self._pressed = True
+            try:
+                self._on_press()
+            except BaseException:
+                # Still new next time, so the stop is retried
+                self._pressed = False
+                raise
+            self._latency.record(time.monotonic_ns() - seen)
+            self._presses += 1
+        self._pressed = pressed
+
+    def _run(self) -> None:
+        interval_ns = int(self._POLL_INTERVAL * 1e9)
+        deadline_ns = time.monotonic_ns()
+        while True:
+            try:
+                self._poll()
+            except Exception:  # noqa: BLE001
+                # Keep watching whatever happens
+                _log.exception("plunger stop failed")
+
+            deadline_ns += interval_ns
+            now_ns = time.monotonic_ns()
+            deadline_ns = max(deadline_ns, now_ns)
+            if self._stopping.wait((deadline_ns - now_ns) / 1e9):
+                return
+
+    def log_report(self) -> None:
+        _log.info(f"plunger: {self._presses} presses, stop {self._latency}")
@@ -0,0 +1,207 @@
+"""Runs all periodic hardware work from one task."""
+
+import asyncio
+import inspect
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from types import TracebackType
+from typing import Self
+
+from dalek.latency import Histogram
+
+_log = logging.getLogger(__name__)
+
+type JobFunction = Callable[[], Awaitable[None] | None]
+
+
+class Job:
+    def __init__(
+        self,
+        name: str,
+        period_ns: int,
+        deadline_ns: int,
+        fn: JobFunction,
+    ) -> None:
+        super().__init__()
+        self._name = name
+        self._period_ns = period_ns
+        self._deadline_ns = deadline_ns
+        self._fn = fn
+        self._cancelled = False
+        self._runs = 0
+        self._overruns = 0
+        self._failures = 0
+        self._failing = False
+        self._lateness_ns = 0
+        self._jitter = Histogram()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def deadline_ns(self) -> int:
+        return self._deadline_ns
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def runs(self) -> int:
+        return self._runs
+
+    @property
+    def overruns(self) -> int:
+        return self._overruns
+
+    @property
+    def failures(self) -> int:
+        return self._failures
+
+    @property
+    def jitter(self) -> Histogram:
+        return self._jitter
+
+    @property
+    def lateness_ns(self) -> int:
+        """How late the latest run started."""
+        return self._lateness_ns
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    async def run(self, now_ns: int) -> None:
+        self._lateness_ns = now_ns - self._deadline_ns
+        self._jitter.record(self._lateness_ns)
+        self._runs += 1
+        try:
+            result = self._fn()
+            if inspect.isawaitable(result):
+                await result
+        except Exception:  # noqa: BLE001
+            # One broken run mustn't stop the job, or the others, which
+            # include the safety checks; only the first of a streak is logged
+            if not self._failing:
+                _log.exception(f"job {self._name} failed")
+            self._failing = True
+            self._failures += 1
+        else:
+            self._failing = False
+
+        # Deadlines are absolute, so the job doesn't drift however late it
+        # runs; if it's missed whole periods, they're skipped, not caught up
+        self._deadline_ns += self._period_ns
+        now_ns = time.monotonic_ns()
+        if self._deadline_ns <= now_ns:
+            missed = (now_ns - self._deadline_ns) // self._period_ns + 1
+            self._overruns += missed
+            self._deadline_ns += missed * self._period_ns
+
+    def __str__(self) -> str:
+        return (
+            f"{self._name}: {self._runs} runs, {self._overruns} overruns, "
+            f"{self._failures} failures, jitter {self._jitter}"
+        )
+
+
+class Scheduler:
+    """Runs periodic jobs at absolute deadlines, from a single task.
+
+    A job's deadlines are at phase + n * period seconds after the scheduler
+    was created, so jobs with the same period and phase always run in the
+    same wakeup.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._epoch_ns = time.monotonic_ns()
+        self._jobs: list[Job] = []
+        self._wakeup: asyncio.Future[None] | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> Self:
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self.log_report()
+
+    @property
+    def jobs(self) -> list[Job]:
+        return list(self._jobs)
+
+    def every(
+        self,
+        name: str,
+        period: float,
+        fn: JobFunction,
+        phase: float = 0.0,
+    ) -> Job:
+        period_ns = int(period * 1e9)
+        first_ns = self._epoch_ns + int(phase * 1e9)
+        now_ns = time.monotonic_ns()
+        if first_ns <= now_ns:
+            first_ns += ((now_ns - first_ns) // period_ns + 1) * period_ns
+        job = Job(name, period_ns, first_ns, fn)
+        self._jobs.append(job)
+        # It might be due before whatever the scheduler is waiting for
+        self._wake()
+        return job
+
+    def _wake(self) -> None:
+        if self._wakeup and not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+    async def _sleep(self, delay: float | None) -> None:
+        loop = asyncio.get_running_loop()
+        self._wakeup = loop.create_future()
+        timer = loop.call_later(delay, self._wake) if delay else None
+        try:
+            await self._wakeup
+        finally:
+            if timer:
+                timer.cancel()
+            self._wakeup = None
+
+    def _remove_cancelled(self) -> None:
+        cancelled = [job for job in self._jobs if job.cancelled]
+        if cancelled:
+            self._jobs = [job for job in self._jobs if not job.cancelled]
+            for job in cancelled:
+                _log.info(str(job))
+
+    async def _run(self) -> None:
+        while True:
+            self._remove_cancelled()
+            if not self._jobs:
+                await self._sleep(None)
+                continue
+
+            deadline_ns = min(job.deadline_ns for job in self._jobs)
+            delay = (deadline_ns - time.monotonic_ns()) / 1e9
+            if delay > 0:
+                await self._sleep(delay)
+                continue
+
+            now_ns = time.monotonic_ns()
+            for job in self._jobs:
+                if not job.cancelled and job.deadline_ns <= now_ns:
+                    await job.run(now_ns)
+
+    def log_report(self) -> None:
+        self._remove_cancelled()
+        for job in self._jobs:
+            _log.info(str(job))
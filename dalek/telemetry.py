@@ -0,0 +1,178 @@
+"""High-rate samples of the Dalek's state, for clients to plot."""
+
+import logging
+import math
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from types import TracebackType
+from typing import NamedTuple, Self
+
+from dalek.scheduler import Job, Scheduler
+from dalek.utils import RingBuffer
+
+_log = logging.getLogger(__name__)
+
+
+class Probe(NamedTuple):
+    read: Callable[[], float]
+    # Values are sent as whole multiples of 1 / scale
+    scale: float
+
+
+def encode(values: Iterable[float], scale: float) -> str:
+    """Each value as the difference from the previous one, in units of
+    1 / scale. The first is relative to 0, so it stands alone; missing
+    values (NaN) are left empty."""
+    previous = 0
+    deltas = []
+    for v in values:
+        if math.isnan(v):
+            deltas.append("")
+            continue
+        q = round(v * scale)
+        deltas.append(str(q - previous))
+        previous = q
+    return ",".join(deltas)
+
+
+def decode(encoded: str, scale: float) -> list[float]:
+    q = 0
+    values = []
+    for delta in encoded.split(",") if encoded else []:
+        if delta:
+            q += int(delta)
+            values.append(q / scale)
+        else:
+            values.append(math.nan)
+    return values
+
+
+class Telemetry:
+    """Samples every probe into its own ring buffer, only while anyone is
+    subscribed.
+
+    Sample n was taken n / RATE seconds after sampling started. Each field
+    is one preallocated buffer, so sampling allocates nothing beyond the
+    values read.
+    """
+
+    RATE = 20.0
+    _HISTORY = 10.0
+
+    def __init__(
+        self,
+        scheduler: Scheduler,
+        probes: Mapping[str, Probe],
+    ) -> None:
+        super().__init__()
+        self._scheduler = scheduler
+        self._probes = dict(probes) | {
+            # How late sampling ran, in ms, and how many samples it missed
+            "lag": Probe(self._lag, 10),
+            "overruns": Probe(self._overruns, 1),
+        }
+        self._indexes = {name: i for i, name in enumerate(self._probes)}
+        self._reads = [p.read for p in self._probes.values()]
+        self._buffers = [
+            RingBuffer(round(self.RATE * self._HISTORY)) for _ in self._probes
+        ]
+        self._count = 0
+        self._failing = False
+        self._subscribers = 0
+        self._job: Job | None = None
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._subscribers = 0
+        self._stop()
+
+    @property
+    def fields(self) -> list[str]:
+        return list(self._probes)
+
+    @property
+    def count(self) -> int:
+        """Samples taken since sampling last started."""
+        return self._count
+
+    def _lag(self) -> float:
+        return self._job.lateness_ns / 1e6 if self._job else 0.0
+
+    def _overruns(self) -> float:
+        return self._job.overruns if self._job else 0.0
+
+    def subscribe(self) -> None:
+        self._subscribers += 1
+        if not self._job or self._job.cancelled:
+            self._count = 0
+            for buffer in self._buffers:
+                buffer.clear()
+            self._job = self._scheduler.every(
+                "telemetry",
+                1 / self.RATE,
+                self._sample,
+            )
+            _log.info(f"sampling telemetry at {self.RATE:g}Hz")
+
+    def unsubscribe(self) -> None:
+        self._subscribers = max(self._subscribers - 1, 0)
+        if not self._subscribers:
+            self._stop()
+
+    def _stop(self) -> None:
+        if self._job:
+            self._job.cancel()
+            self._job = None
+            _log.info(f"stopped telemetry after {self._count} samples")
+
+    def _sample(self) -> None:
+        failed = False
+        for i, read in enumerate(self._reads):
+            try:
+                value = read()
+            except Exception as e:  # noqa: BLE001
+                # Unplugged motors raise all sorts, e.g. ev3dev2's
+                # DeviceNotFound, and the other fields are still worth having
+                if not self._failing:
+                    _log.error(f"failed to read telemetry: {e!r}")
+                failed = True
+                value = math.nan
+            self._buffers[i].append(value)
+        self._failing = failed
+        self._count += 1
+
+    def batch(
+        self,
+        names: Sequence[str],
+        start: int,
+        step: int,
+    ) -> tuple[int, list[str]]:
+        """Encode every step'th sample from start onwards, for each field.
+
+        Returns where the next batch starts, and the index of the first
+        sample, the seconds between samples, then the name, scale and
+        encoded values of each field; or no values if there are no new
+        samples. Samples are chosen by index, so batches follow on from
+        each other, and older samples that have been overwritten are
+        skipped.
+        """
+        # The lag and overruns fields mean there's always a buffer
+        oldest = self._count - len(self._buffers[0])
+        first = max(start, oldest)
+        first += -first % step
+        if first >= self._count:
+            return start, []
+
+        values = [f"{first}", f"{step / self.RATE:g}"]
+        for name in names:
+            i = self._indexes[name]
+            scale = self._probes[name].scale
+            samples = self._buffers[i].latest(self._count - first)[::step]
+            values += [name, f"{scale:g}", encode(samples, scale)]
+        return self._count, values
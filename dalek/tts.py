@@ -0,0 +1,182 @@
+"""On-disk cache of synthesized speech."""
+
+import asyncio
+import hashlib
+import logging
+import os
+import os.path
+import re
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from dalek.audio import Clip, load_wav
+from dalek.utils import espeakify
+
+_log = logging.getLogger(__name__)
+
+# Anything else in the directory isn't ours, and is left alone
+_ENTRY_NAME = re.compile(r"[0-9a-f]{64}\.wav")
+_TMP_SUFFIX = ".tmp"
+
+
+class Cache:
+    """Size-bounded LRU cache of WAVs produced by the text to speech command.
+
+    The command is run as 'command TEXT OUTPUT_FILE'. Entries are keyed by
+    the espeakified text and the command's contents, so changing the voice
+    parameters in the script doesn't play stale audio. Recency is kept in
+    the files' mtimes, so it survives restarts.
+    """
+
+    def __init__(self, cache_dir: str, command: str, max_bytes: int) -> None:
+        super().__init__()
+        self._cache_dir = cache_dir
+        self._command = command
+        self._max_bytes = max_bytes
+        self._voice = self._hash_command(command)
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._clips: dict[str, Clip] = {}
+        self._pending: dict[str, asyncio.Task[Clip | None]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._load_index()
+
+    @staticmethod
+    def _hash_command(command: str) -> bytes:
+        try:
+            with open(command, "rb") as f:
+                return hashlib.sha256(f.read()).digest()
+        except OSError:
+            return command.encode()
+
+    def _load_index(self) -> None:
+        os.makedirs(self._cache_dir, exist_ok=True)
+        entries = []
+        with os.scandir(self._cache_dir) as dir_entries:
+            for entry in dir_entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if _ENTRY_NAME.fullmatch(entry.name):
+                    st = entry.stat()
+                    entries.append((st.st_mtime_ns, entry.name, st.st_size))
+                elif entry.name.endswith(_TMP_SUFFIX) and _ENTRY_NAME.fullmatch(
+                    entry.name.removesuffix(_TMP_SUFFIX),
+                ):
+                    # Left over from an interrupted synthesis
+                    os.remove(entry.path)
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+            self._size += size
+        self._evict()
+        _log.info(
+            f"TTS cache has {len(self._entries)} entries, {self._size} bytes",
+        )
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _name(self, text: str) -> str:
+        h = hashlib.sha256(self._voice)
+        h.update(espeakify(text).encode())
+        return h.hexdigest() + ".wav"
+
+    def _drop(self, name: str) -> None:
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._size -= size
+        # Anything still playing it keeps its copy or mapping
+        self._clips.pop(name, None)
+
+    def _evict(self) -> None:
+        while self._size > self._max_bytes and self._entries:
+            name = next(iter(self._entries))
+            self._drop(name)
+            try:
+                os.remove(os.path.join(self._cache_dir, name))
+            except OSError as e:
+                _log.error(f"failed to evict '{name}' from TTS cache: {e}")
+
+    async def get(self, text: str) -> Clip | None:
+        name = self._name(text)
+        path = os.path.join(self._cache_dir, name)
+
+        if name in self._entries:
+            self._entries.move_to_end(name)
+            try:
+                await asyncio.to_thread(os.utime, path)
+            except FileNotFoundError:
+                # Deleted behind our back, so make it again
+                _log.warning(f"'{name}' has gone from the TTS cache")
+                self._drop(name)
+            else:
+                self._hits += 1
+                return self._load(name)
+
+        self._misses += 1
+        if name not in self._pending:
+            self._pending[name] = asyncio.create_task(
+                self._synthesize(text, name),
+            )
+        # Shielded so that interrupting one speaker doesn't waste the work
+        return await asyncio.shield(self._pending[name])
+
+    async def _synthesize(self, text: str, name: str) -> Clip | None:
+        try:
+            return await self._run_command(text, name)
+        finally:
+            del self._pending[name]
+
+    async def _run_command(self, text: str, name: str) -> Clip | None:
+        path = os.path.join(self._cache_dir, name)
+        tmp = path + _TMP_SUFFIX
+
+        p = await asyncio.create_subprocess_exec(
+            self._command,
+            espeakify(text),
+            tmp,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        if await p.wait() != 0 or not os.path.exists(tmp):
+            _log.error(
+                f"speech synthesis failed with exit code {p.returncode}",
+            )
+            return None
+
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+        self._entries[name] = size
+        self._size += size
+        clip = self._load(name)
+        self._evict()
+        return clip
+
+    def _load(self, name: str) -> Clip | None:
+        clip = self._clips.get(name)
+        if not clip:
+            clip = load_wav(os.path.join(self._cache_dir, name))
+            if clip:
+                self._clips[name] = clip
+        return clip
+
+    def log_report(self) -> None:
+        _log.info(
+            f"TTS cache: {self._hits} hits, {self._misses} misses, "
+            f"{len(self._entries)} entries, {self._size} bytes",
+        )
+
+    async def prewarm(self, texts: Iterable[str]) -> None:
+        for text in texts:
+            if self._name(text) not in self._entries:
+                _log.info(f"pre-warming TTS cache with '{text}'")
+                await self.get(text)
@@ -1,8 +1,12 @@
 """Utilities."""
 
+import asyncio
 import logging
+import math
 import os
 import re
+from array import array
+from collections import deque
 from enum import Enum, auto
 
 _LOG = logging.getLogger(__name__)
@@ -14,14 +18,17 @@ def espeakify(text: str) -> str:
     return re.sub(r"Dalek", "Dahlek", text, flags=re.IGNORECASE)
 
 
+_NOT_FILENAME_CHARS = re.compile(r"[^a-z0-9-]")
+
+
 def sound_filename(text: str) -> str:
-    text = text.lower().replace(" ", "-")
-    return "".join(
-        c if re.fullmatch(r"[a-z0-9-]", c) is not None else "" for c in text
-    )
+    return _NOT_FILENAME_CHARS.sub("", text.lower().replace(" ", "-"))
 
 
 def clamp_control_range(value: float) -> float:
+    # NaN would otherwise get through, and no motor accepts it
+    if math.isnan(value):
+        return 0.0
     if value < -1.0:
         return -1.0
     if value > 1.0:
@@ -41,3 +48,71 @@ def sign(x: float) -> Sign:
     if x < 0.0:
         return Sign.NEGATIVE
     return Sign.ZERO
+
+
+class LatestValue[T]:
+    """Holds only the most recently put value; older ones are dropped."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._values: deque[T] = deque(maxlen=1)
+        self._event = asyncio.Event()
+        self._dropped = 0
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def put(self, value: T) -> None:
+        if self._values:
+            self._dropped += 1
+        self._values.append(value)
+        self._event.set()
+
+    async def get(self) -> T:
+        while not self._values:
+            self._event.clear()
+            await self._event.wait()
+        return self._values.popleft()
+
+
+class RingBuffer:
+    """Floats in space allocated up front; the oldest are overwritten."""
+
+    def __init__(self, capacity: int) -> None:
+        super().__init__()
+        self._values = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def capacity(self) -> int:
+        return len(self._values)
+
+    def append(self, value: float) -> None:
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        self._len = min(self._len + 1, len(self._values))
+
+    def clear(self) -> None:
+        self._next = 0
+        self._len = 0
+
+    def values(self) -> list[float]:
+        """All the values, oldest first."""
+        return self.latest(self._len)
+
+    def latest(self, n: int) -> list[float]:
+        """The newest n values, oldest first."""
+        n = min(max(n, 0), self._len)
+        start = (self._next - n) % len(self._values)
+        end = start + n
+        if end <= len(self._values):
+            return self._values[start:end].tolist()
+        return (
+            self._values[start:].tolist()
+            + self._values[: end - len(self._values)].tolist()
+        )
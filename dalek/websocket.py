@@ -1,17 +1,27 @@
 """Websocket handlers."""
 
+import asyncio
 import base64
 import json
 import logging
+import struct
+import time
+from collections import deque
 from collections.abc import Awaitable, Callable, Sequence
-from enum import Enum, StrEnum, auto
+from contextlib import suppress
+from enum import Enum, IntEnum, StrEnum, auto
 from types import TracebackType
-from typing import Self
+from typing import NamedTuple, Self
 
 from websockets import Data
 from websockets.asyncio.server import ServerConnection
+from websockets.exceptions import ConnectionClosed
 
-from dalek.dalek import Dalek
+from dalek import latency
+from dalek.capture import scale_jpeg
+from dalek.dalek import Dalek, HeadPreset, SpeechPolicy
+from dalek.telemetry import Telemetry
+from dalek.utils import LatestValue
 
 _log = logging.getLogger(__name__)
 
@@ -21,6 +31,24 @@ class _Result(Enum):
     SHUTDOWN = auto()
 
 
+_MAX_SPECTATORS = 8
+
+# The heartbeat pings the client this often, and stops the motors if the pong
+# takes longer than the timeout or the round-trip time is too high. So the
+# Dalek stops moving at most _HEARTBEAT_INTERVAL + _HEARTBEAT_TIMEOUT seconds
+# after the link dies.
+_HEARTBEAT_INTERVAL = 0.5
+_HEARTBEAT_TIMEOUT = 1.0
+_MAX_RTT = 0.5
+# Number of heartbeats between RTT reports to the client, and the number of
+# heartbeats the reported stats cover
+_RTT_REPORT_INTERVAL = 4
+_RTT_WINDOW = 20
+# Telemetry is sampled much faster than this, but sent in batches, so that
+# each sample doesn't cost a message
+_TELEMETRY_BATCH_INTERVAL = 0.5
+
+
 class _Status(StrEnum):
     CONNECTED = "ready"
     SOMEONE_ELSE_CONNECTED = "busy"
@@ -33,7 +61,13 @@ class _Command(StrEnum):
     PLAY_SOUND = "playsound"
     STOP_SOUND = "stopsound"
     SNAPSHOT = "snapshot"
+    STREAM = "stream"
     TOGGLE_LIGHTS = "togglelights"
+    FEATURES = "features"
+    RESOLUTION = "resolution"
+    BATTERY_HISTORY = "batteryhistory"
+    HEAD_TO = "headto"
+    TELEMETRY = "telemetry"
     EXIT = "exit"
 
 
@@ -45,26 +79,219 @@ class _MovementControl(StrEnum):
 
 class _Response(StrEnum):
     BATTERY = "battery"
+    BATTERY_HISTORY = "batteryhistory"
     SNAPSHOT = "snapshot"
+    FEATURES = "features"
+    RTT = "rtt"
+    TELEMETRY = "telemetry"
+
+
+class _Feature(StrEnum):
+    # Snapshots are sent as binary frames (see _FRAME_HEADER) instead of
+    # base64 in JSON. Clients that don't ask for it get the JSON format.
+    BINARY_SNAPSHOT = "binarysnapshot"
+    # Commands without string arguments can be sent as binary frames (see
+    # _BINARY_COMMAND) instead of JSON.
+    BINARY_CONTROL = "binarycontrol"
 
 
-class _Controller:
-    def __init__(self, websocket: ServerConnection, dalek: Dalek) -> None:
+class _FrameType(IntEnum):
+    SNAPSHOT = 1
+
+
+# Binary frames start with: frame type, flags, sequence number. The payload
+# follows immediately after. For snapshots, the low two bits of the flags are
+# the number of quarter turns clockwise to display the image at.
+_FRAME_HEADER = struct.Struct("!BBH")
+
+
+def _binary_frame(
+    frame_type: _FrameType,
+    flags: int,
+    sequence: int,
+    data: bytes,
+) -> bytes:
+    return _FRAME_HEADER.pack(frame_type, flags, sequence & 0xFFFF) + data
+
+
+type _Args = Sequence[str | float]
+
+# Binary commands are: opcode, control (0 if unused), value (0 if unused)
+_BINARY_COMMAND = struct.Struct("!BBf")
+
+# Opcode -> (command, number of args)
+_BINARY_OPCODES = {
+    1: (_Command.BEGIN, 2),
+    2: (_Command.RELEASE, 2),
+    3: (_Command.STOP, 0),
+    4: (_Command.STOP_SOUND, 0),
+    5: (_Command.SNAPSHOT, 0),
+    6: (_Command.STREAM, 1),
+    7: (_Command.TOGGLE_LIGHTS, 0),
+    8: (_Command.EXIT, 0),
+}
+
+_BINARY_CONTROLS = {
+    1: _MovementControl.DRIVE,
+    2: _MovementControl.TURN,
+    3: _MovementControl.HEAD_TURN,
+}
+
+
+class _Role(StrEnum):
+    DRIVER = "driver"
+    SPECTATOR = "spectator"
+
+
+# Spectators can't control anything
+_SPECTATOR_COMMANDS = frozenset(
+    {
+        _Command.FEATURES,
+        _Command.RESOLUTION,
+        _Command.BATTERY_HISTORY,
+        _Command.TELEMETRY,
+    },
+)
+
+
+class _Resolution(StrEnum):
+    AUTO = "auto"
+    FULL = "full"
+    THUMBNAIL = "thumb"
+
+
+class _Level(NamedTuple):
+    name: str
+    scale: int
+    quality: int
+
+
+# Picture sizes, from best to worst. Full size pictures are sent exactly as
+# they came from the camera.
+_LEVELS = (
+    _Level("full", 1, 0),
+    _Level("half", 2, 70),
+    _Level("quarter", 4, 50),
+)
+_THUMBNAIL_LEVEL = len(_LEVELS) - 1
+
+# In auto resolution, each client gets the best level that its measured
+# throughput can send in this long
+_TARGET_SEND_TIME = 0.25
+_INITIAL_THROUGHPUT = 500_000.0
+# Throughput is total bytes over total time for this many recent sends, so
+# that one send that fitted in the socket buffers can't make a slow link
+# look fast, but a run of them shows the link has recovered
+_THROUGHPUT_WINDOW = 8
+# Such sends return almost immediately, and are counted as taking this long
+_MIN_SEND_TIME = 0.001
+
+
+class _Image:
+    """An image, encoded at most once per level and format however many
+    clients get it."""
+
+    def __init__(self, sequence: int, data: bytes, rotation: int) -> None:
         super().__init__()
-        self._websocket = websocket
-        self._dalek = dalek
+        self._sequence = sequence
+        self._data = data
+        # The camera is mounted sideways; rather than decoding and rotating
+        # the JPEG on the brick, clients rotate it for display.
+        self._rotation = rotation
+        self._scaled: dict[int, asyncio.Task[bytes | None]] = {}
+        self._binary_messages: dict[int, bytes] = {}
+        self._json_messages: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def data(self, level: int) -> bytes:
+        if level == 0:
+            return self._data
+        if level not in self._scaled:
+            l = _LEVELS[level]
+            self._scaled[level] = asyncio.create_task(
+                asyncio.to_thread(scale_jpeg, self._data, l.scale, l.quality),
+            )
+        # Shielded, because other clients may be waiting for it too
+        scaled = await asyncio.shield(self._scaled[level])
+        return scaled or self._data
+
+    async def binary_message(self, level: int) -> bytes:
+        if level not in self._binary_messages:
+            self._binary_messages[level] = _binary_frame(
+                _FrameType.SNAPSHOT,
+                (self._rotation // 90) & 0x3,
+                self._sequence,
+                await self.data(level),
+            )
+        return self._binary_messages[level]
+
+    async def json_message(self, level: int) -> str:
+        if level not in self._json_messages:
+            self._json_messages[level] = (
+                json.dumps(
+                    [
+                        _Response.SNAPSHOT,
+                        base64.b64encode(await self.data(level)).decode(),
+                        str(self._rotation),
+                    ],
+                )
+                + "\n"
+            )
+        return self._json_messages[level]
 
-    async def __aenter__(self) -> Self:
-        async def image_handler(data: bytes) -> None:
-            await self._send_image(data)
 
-        await self._dalek.set_camera_handler(image_handler)
+async def _send_latest[T](
+    values: LatestValue[T],
+    send: Callable[[T], Awaitable[None]],
+) -> None:
+    with suppress(ConnectionClosed):
+        while True:
+            await send(await values.get())
 
-        async def battery_handler(data: str) -> None:
-            await self._send_battery(data)
 
-        await self._dalek.set_battery_handler(battery_handler)
+class _Controller:
+    def __init__(
+        self,
+        websocket: ServerConnection,
+        dalek: Dalek,
+        role: _Role,
+    ) -> None:
+        super().__init__()
+        self._websocket = websocket
+        self._dalek = dalek
+        self._role = role
+        self._features: set[_Feature] = set()
+        # Broadcasts are sent from separate tasks, so that if the client falls
+        # behind, stale ones get replaced rather than queued up, and nobody
+        # else has to wait for this client
+        self._images = LatestValue[_Image]()
+        self._resolution = _Resolution.AUTO
+        # Bytes and seconds of recent sends
+        self._sends: deque[tuple[int, float]] = deque(
+            maxlen=_THROUGHPUT_WINDOW,
+        )
+        self._battery = LatestValue[str]()
+        # Likewise RTT reports, so that a stalled send can't hold up the
+        # heartbeat
+        self._rtt = LatestValue[tuple[str, ...]]()
+        self._tasks: list[asyncio.Task[None]] = []
+        self._telemetry: asyncio.Task[None] | None = None
+
+    @property
+    def role(self) -> _Role:
+        return self._role
 
+    async def __aenter__(self) -> Self:
+        self._tasks = [
+            asyncio.create_task(_send_latest(self._images, self._send_image)),
+            asyncio.create_task(
+                _send_latest(self._battery, self._send_battery),
+            ),
+            asyncio.create_task(_send_latest(self._rtt, self._send_rtt)),
+            asyncio.create_task(self._heartbeat()),
+        ]
         return self
 
     async def __aexit__(
@@ -73,12 +300,60 @@ class _Controller:
         exc_val: BaseException | None,
         exc_tb: TracebackType | None,
     ) -> None:
-        await self._dalek.disconnect()
+        if self._role == _Role.DRIVER:
+            await self._dalek.disconnect_driver()
+            latency.log_report()
+        await self._unsubscribe_telemetry()
+        for task in self._tasks:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        _log.info(f"dropped {self._images.dropped} stale images")
+
+    def _heartbeat_failed(self, reason: str) -> None:
+        if self._role == _Role.DRIVER:
+            _log.warning(f"heartbeat failed ({reason}); stopping motors")
+            self._dalek.stop_moving()
+
+    async def _heartbeat(self) -> None:
+        rtts: deque[float] = deque(maxlen=_RTT_WINDOW)
+        count = 0
+
+        with suppress(ConnectionClosed):
+            while True:
+                try:
+                    # The ping itself can block on a dead link, while a
+                    # picture is stuck in the write buffer
+                    async with asyncio.timeout(_HEARTBEAT_TIMEOUT):
+                        pong = await self._websocket.ping()
+                        rtt = await pong
+                except TimeoutError:
+                    self._heartbeat_failed(
+                        f"no pong after {_HEARTBEAT_TIMEOUT:g}s",
+                    )
+                    continue
+
+                if rtt > _MAX_RTT:
+                    self._heartbeat_failed(f"RTT {rtt * 1000:.0f}ms")
+
+                rtts.append(rtt)
+                count += 1
+                if count % _RTT_REPORT_INTERVAL == 0:
+                    self._rtt.put(
+                        (
+                            f"{rtt * 1000:.0f}",
+                            f"{sum(rtts) / len(rtts) * 1000:.0f}",
+                            f"{max(rtts) * 1000:.0f}",
+                        ),
+                    )
+
+                await asyncio.sleep(_HEARTBEAT_INTERVAL)
 
     def _bad_args(
         self,
         command: str,
-        args: Sequence[str],
+        args: _Args,
         required: str,
     ) -> None:
         _log.warning(
@@ -89,11 +364,109 @@ class _Controller:
         _log.info(f"send {response} {list(args)}")
         await self._websocket.send(json.dumps([response, *args]) + "\n")
 
-    async def _send_battery(self, data: str) -> None:
-        await self._send(_Response.BATTERY, data)
+    async def _send_rtt(self, report: tuple[str, ...]) -> None:
+        await self._send(_Response.RTT, *report)
+
+    def send_battery(self, message: str) -> None:
+        self._battery.put(message)
+
+    async def _send_battery(self, message: str) -> None:
+        _log.info(f"send {message.strip()}")
+        await self._websocket.send(message)
+
+    def send_image(self, image: _Image) -> None:
+        self._images.put(image)
+
+    def _image_level(self, size: int) -> int:
+        if self._resolution == _Resolution.FULL:
+            return 0
+        if self._resolution == _Resolution.THUMBNAIL:
+            return _THUMBNAIL_LEVEL
+        budget = self._throughput() * _TARGET_SEND_TIME
+        for i, level in enumerate(_LEVELS):
+            # Roughly; lower quality makes the smaller levels smaller still
+            if size / level.scale**2 <= budget:
+                return i
+        return _THUMBNAIL_LEVEL
+
+    async def _send_image(self, image: _Image) -> None:
+        level = self._image_level(len(image))
+        message: bytes | str
+        if _Feature.BINARY_SNAPSHOT in self._features:
+            message = await image.binary_message(level)
+            _log.info(
+                f"send binary {_FrameType.SNAPSHOT} {len(message)} bytes "
+                f"({_LEVELS[level].name})",
+            )
+        else:
+            message = await image.json_message(level)
+            _log.info(
+                f"send {_Response.SNAPSHOT} {len(message)} bytes "
+                f"({_LEVELS[level].name})",
+            )
+
+        start = time.monotonic()
+        await self._websocket.send(message)
+        self._record_send(len(message), time.monotonic() - start)
+
+    def _record_send(self, size: int, elapsed: float) -> None:
+        self._sends.append((size, max(elapsed, _MIN_SEND_TIME)))
+
+    def _throughput(self) -> float:
+        if not self._sends:
+            return _INITIAL_THROUGHPUT
+        return sum(size for size, _ in self._sends) / sum(
+            elapsed for _, elapsed in self._sends
+        )
+
+    async def _send_telemetry(self, fields: list[str], step: int) -> None:
+        telemetry = self._dalek.telemetry
+        telemetry.subscribe()
+        try:
+            # Starts with whatever history there already is
+            start = 0
+            with suppress(ConnectionClosed):
+                while True:
+                    await asyncio.sleep(_TELEMETRY_BATCH_INTERVAL)
+                    start, values = telemetry.batch(fields, start, step)
+                    if values:
+                        await self._websocket.send(
+                            json.dumps([_Response.TELEMETRY, *values]) + "\n",
+                        )
+        finally:
+            telemetry.unsubscribe()
+
+    async def _unsubscribe_telemetry(self) -> None:
+        if self._telemetry:
+            self._telemetry.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._telemetry
+            self._telemetry = None
+
+    async def _subscribe_telemetry(self, rate: float, requested: _Args) -> None:
+        await self._unsubscribe_telemetry()
+        fields = []
+        for field in map(str, requested):
+            if field in self._dalek.telemetry.fields:
+                fields.append(field)
+            else:
+                _log.info(f"ignoring unknown telemetry field '{field}'")
+        if rate > 0 and fields:
+            # Every step'th sample, which is as close to the rate as the
+            # sampling allows
+            step = max(round(Telemetry.RATE / rate), 1)
+            self._telemetry = asyncio.create_task(
+                self._send_telemetry(fields, step),
+            )
 
-    async def _send_image(self, data: bytes) -> None:
-        await self._send(_Response.SNAPSHOT, base64.b64encode(data).decode())
+    async def _negotiate_features(self, requested: _Args) -> None:
+        self._features = set()
+        for feature in map(str, requested):
+            try:
+                self._features.add(_Feature(feature))
+            except ValueError:
+                _log.info(f"ignoring unknown feature '{feature}'")
+        await self._send(_Response.FEATURES, *sorted(self._features))
 
     async def _begin_command(
         self,
@@ -119,12 +492,22 @@ class _Controller:
         elif control == _MovementControl.HEAD_TURN:
             await self._dalek.head_turn_release(value)
 
-    async def handle(self, command: str, args: Sequence[str]) -> _Result:
+    def parse(self, message: Data) -> tuple[str, _Args] | None:
+        if (
+            isinstance(message, bytes)
+            and _Feature.BINARY_CONTROL in self._features
+        ):
+            return _parse_binary_message(message)
+        return _parse_message(message)
+
+    async def handle(self, command: str, args: _Args) -> _Result:
         _log.info(f"recv {command} {args}")
-        if command == _Command.BEGIN:
+        if self._role == _Role.SPECTATOR and command not in _SPECTATOR_COMMANDS:
+            _log.warning(f"spectator attempted command {command} {args}")
+        elif command == _Command.BEGIN:
             if len(args) == 2:  # noqa: PLR2004
                 await self._begin_command(
-                    _MovementControl(args[0]),
+                    _MovementControl(str(args[0])),
                     float(args[1]),
                 )
             else:
@@ -132,24 +515,66 @@ class _Controller:
         elif command == _Command.RELEASE:
             if len(args) == 2:  # noqa: PLR2004
                 await self._release_command(
-                    _MovementControl(args[0]),
+                    _MovementControl(str(args[0])),
                     float(args[1]),
                 )
             else:
                 self._bad_args(command, args, "2")
         elif command == _Command.STOP:
             self._dalek.stop_moving()
+        elif command == _Command.HEAD_TO:
+            # A preset's name, or a position from -1 to 1
+            if len(args) == 1 and args[0] in HeadPreset:
+                await self._dalek.head_to_preset(HeadPreset(str(args[0])))
+            elif len(args) == 1:
+                await self._dalek.head_to(float(args[0]))
+            else:
+                self._bad_args(command, args, "1")
         elif command == _Command.TOGGLE_LIGHTS:
             self._dalek.toggle_lights()
         elif command == _Command.PLAY_SOUND:
             if len(args) == 1:
-                await self._dalek.speak(args[0])
+                await self._dalek.speak(str(args[0]))
+            elif len(args) == 2 and args[1] in SpeechPolicy:  # noqa: PLR2004
+                await self._dalek.speak(
+                    str(args[0]),
+                    SpeechPolicy(str(args[1])),
+                )
             else:
-                self._bad_args(command, args, "1")
+                self._bad_args(command, args, "1 or 2")
         elif command == _Command.STOP_SOUND:
             await self._dalek.stop_speaking()
         elif command == _Command.SNAPSHOT:
             await self._dalek.take_picture()
+        elif command == _Command.STREAM:
+            if len(args) == 1:
+                fps = float(args[0])
+                if fps > 0:
+                    await self._dalek.start_stream(fps)
+                else:
+                    await self._dalek.stop_stream()
+            else:
+                self._bad_args(command, args, "1")
+        elif command == _Command.FEATURES:
+            await self._negotiate_features(args)
+        elif command == _Command.BATTERY_HISTORY:
+            interval, history = self._dalek.battery_history()
+            await self._send(
+                _Response.BATTERY_HISTORY,
+                f"{interval:g}",
+                *(f"{v:.2f}" for v in history),
+            )
+        elif command == _Command.TELEMETRY:
+            # A rate in Hz, then the fields to send; a rate of 0 unsubscribes
+            if args:
+                await self._subscribe_telemetry(float(args[0]), args[1:])
+            else:
+                self._bad_args(command, args, "1 or more")
+        elif command == _Command.RESOLUTION:
+            if len(args) == 1 and args[0] in _Resolution:
+                self._resolution = _Resolution(str(args[0]))
+            else:
+                self._bad_args(command, args, "1")
         elif command == _Command.EXIT:
             return _Result.SHUTDOWN
         else:
@@ -158,7 +583,7 @@ class _Controller:
         return _Result.KEEP_GOING
 
 
-def _parse_message(message: Data) -> tuple[str, list[str]] | None:
+def _parse_message(message: Data) -> tuple[str, _Args] | None:
     if isinstance(message, bytes):
         try:
             message = message.decode("utf-8")
@@ -184,40 +609,139 @@ def _parse_message(message: Data) -> tuple[str, list[str]] | None:
     return (data[0], data[1:])
 
 
+def _trace_label(command: str, args: _Args) -> str:
+    # Only known names, so that clients can't create unlimited histograms
+    if command not in _Command:
+        return "unknown"
+    if (
+        command in (_Command.BEGIN, _Command.RELEASE)
+        and args
+        and args[0] in _MovementControl
+    ):
+        return f"{command} {args[0]}"
+    return command
+
+
+def _parse_binary_message(message: bytes) -> tuple[str, _Args] | None:
+    if len(message) != _BINARY_COMMAND.size:
+        _log.warning(f"binary command has wrong length: {message!r}")
+        return None
+
+    opcode, control, value = _BINARY_COMMAND.unpack(message)
+
+    if opcode not in _BINARY_OPCODES:
+        _log.warning(f"unknown binary opcode {opcode}")
+        return None
+    command, num_args = _BINARY_OPCODES[opcode]
+
+    if num_args == 2:  # noqa: PLR2004
+        if control not in _BINARY_CONTROLS:
+            _log.warning(f"unknown binary control {control}")
+            return None
+        return (command, [_BINARY_CONTROLS[control], value])
+    if num_args == 1:
+        return (command, [value])
+    return (command, [])
+
+
+class _Broadcaster:
+    """Fans out images and battery updates to every connected client."""
+
+    def __init__(self, dalek: Dalek) -> None:
+        super().__init__()
+        self._dalek = dalek
+        self._lock = asyncio.Lock()
+        self._controllers: set[_Controller] = set()
+        self._subscribed = False
+        self._image_sequence = 0
+
+    @property
+    def has_driver(self) -> bool:
+        return any(c.role == _Role.DRIVER for c in self._controllers)
+
+    @property
+    def num_spectators(self) -> int:
+        return sum(c.role == _Role.SPECTATOR for c in self._controllers)
+
+    async def _image_handler(self, data: bytes) -> None:
+        image = _Image(
+            self._image_sequence,
+            data,
+            self._dalek.camera_rotation,
+        )
+        self._image_sequence += 1
+        for c in self._controllers:
+            c.send_image(image)
+
+    async def _battery_handler(self, data: str) -> None:
+        message = json.dumps([_Response.BATTERY, data]) + "\n"
+        for c in self._controllers:
+            c.send_battery(message)
+
+    async def add(self, c: _Controller) -> None:
+        # Added before anything is awaited, so that roles are decided from an
+        # up-to-date set of connections
+        self._controllers.add(c)
+        async with self._lock:
+            if not self._subscribed:
+                await self._dalek.set_camera_handler(self._image_handler)
+                await self._dalek.set_battery_handler(self._battery_handler)
+                self._subscribed = True
+
+    async def remove(self, c: _Controller) -> None:
+        self._controllers.discard(c)
+        async with self._lock:
+            if self._subscribed and not self._controllers:
+                await self._dalek.disconnect()
+                self._subscribed = False
+
+
 def handler(dalek: Dalek) -> Callable[[ServerConnection], Awaitable[None]]:
-    connected = False
+    broadcaster = _Broadcaster(dalek)
 
     async def _handler(websocket: ServerConnection) -> None:
-        nonlocal connected
-
-        if connected:
+        if not broadcaster.has_driver:
+            role = _Role.DRIVER
+        elif broadcaster.num_spectators < _MAX_SPECTATORS:
+            role = _Role.SPECTATOR
+        else:
             await websocket.send(
                 json.dumps([_Status.SOMEONE_ELSE_CONNECTED]) + "\n",
             )
             _log.info(
                 (
                     f"attempted to connect from {websocket.remote_address}, "
-                    "but someone else is already connected",
+                    "but there are too many spectators",
                 ),
             )
             return
 
-        connected = True
-        _log.info(f"connected from {websocket.remote_address}")
+        _log.info(f"connected from {websocket.remote_address} as {role}")
 
         try:
-            await websocket.send(
-                json.dumps([_Status.CONNECTED, dalek.battery_status()]),
-            )
-
-            async with _Controller(websocket, dalek) as c:
-                async for message in websocket:
-                    command = _parse_message(message)
-                    if command and await c.handle(*command) == _Result.SHUTDOWN:
-                        websocket.server.close()
-                        break
+            async with _Controller(websocket, dalek, role) as c:
+                await broadcaster.add(c)
+                try:
+                    await websocket.send(
+                        json.dumps(
+                            [_Status.CONNECTED, dalek.battery_status(), role],
+                        ),
+                    )
+
+                    async for message in websocket:
+                        trace = latency.Trace(latency.Source.WEBSOCKET)
+                        command = c.parse(message)
+                        if not command:
+                            continue
+                        trace.parsed(_trace_label(*command))
+                        with latency.tracing(trace):
+                            result = await c.handle(*command)
+                        if result == _Result.SHUTDOWN:
+                            websocket.server.close()
+                            break
+                finally:
+                    await broadcaster.remove(c)
         finally:
-            connected = False
             _log.info(f"disconnected from {websocket.remote_address}")
 
     return _handler
@@ -3,6 +3,7 @@ import { Spinner } from "./spin.js";
 $(document).ready(function () {
   var READY = "ready";
   var BUSY = "busy";
+  var SPECTATOR = "spectator";
   var EXIT = "exit";
   var BEGIN = "begin";
   var RELEASE = "release";
@@ -10,11 +11,43 @@ $(document).ready(function () {
   var TURN = "turn";
   var STOP = "stop";
   var HEAD_TURN = "headturn";
+  var HEAD_TO = "headto";
   var PLAY_SOUND = "playsound";
   var STOP_SOUND = "stopsound";
   var SNAPSHOT = "snapshot";
+  var STREAM = "stream";
   var TOGGLE_LIGHTS = "togglelights";
+  var FEATURES = "features";
+  var RESOLUTION = "resolution";
   var BATTERY = "battery";
+  var BATTERY_HISTORY = "batteryhistory";
+  var RTT = "rtt";
+
+  var FEATURE_BINARY_SNAPSHOT = "binarysnapshot";
+  var FEATURE_BINARY_CONTROL = "binarycontrol";
+
+  // Binary frames have a 4-byte header: type, flags, sequence number. For
+  // snapshots, the low two bits of the flags are the number of quarter turns
+  // clockwise to display the image at.
+  var FRAME_HEADER_SIZE = 4;
+  var FRAME_SNAPSHOT = 1;
+  var FRAME_ROTATION_MASK = 0x3;
+
+  // Binary commands are 6 bytes: opcode, control, float32 value
+  var BINARY_COMMAND_SIZE = 6;
+  var OPCODES = {};
+  OPCODES[BEGIN] = 1;
+  OPCODES[RELEASE] = 2;
+  OPCODES[STOP] = 3;
+  OPCODES[STOP_SOUND] = 4;
+  OPCODES[SNAPSHOT] = 5;
+  OPCODES[STREAM] = 6;
+  OPCODES[TOGGLE_LIGHTS] = 7;
+  OPCODES[EXIT] = 8;
+  var CONTROLS = {};
+  CONTROLS[DRIVE] = 1;
+  CONTROLS[TURN] = 2;
+  CONTROLS[HEAD_TURN] = 3;
 
   function Socket(callbacks) {
     var STATE_DISCONNECTED = 0;
@@ -24,6 +57,8 @@ $(document).ready(function () {
     var verbose = false;
     var state = STATE_DISCONNECTED;
     var socket = null;
+    var binary_control = false;
+    var spectator = false;
 
     function log(arg) {
       if (verbose) {
@@ -35,9 +70,30 @@ $(document).ready(function () {
       console.log("Network: bad message '%s'", args);
     }
 
+    function onbinarymessage(data) {
+      if (state !== STATE_READY || data.byteLength < FRAME_HEADER_SIZE) {
+        logError(data);
+        return;
+      }
+
+      var header = new DataView(data, 0, FRAME_HEADER_SIZE);
+      if (header.getUint8(0) === FRAME_SNAPSHOT) {
+        callbacks.snapshot(
+          URL.createObjectURL(
+            new Blob([data.slice(FRAME_HEADER_SIZE)], { type: "image/jpeg" }),
+          ),
+          (header.getUint8(1) & FRAME_ROTATION_MASK) * 90,
+        );
+      } else {
+        logError(data);
+      }
+    }
+
     function onmessage(event) {
       log(event);
-      if (typeof event.data === "string") {
+      if (event.data instanceof ArrayBuffer) {
+        onbinarymessage(event.data);
+      } else if (typeof event.data === "string") {
         var msg = JSON.parse(event.data.trim());
         log(msg);
 
@@ -47,7 +103,10 @@ $(document).ready(function () {
 
           if (cmd === READY && state !== STATE_READY && args.length > 0) {
             state = STATE_READY;
-            callbacks.ready();
+            binary_control = false;
+            spectator = args.length > 1 && args[1] === SPECTATOR;
+            send(FEATURES, FEATURE_BINARY_SNAPSHOT, FEATURE_BINARY_CONTROL);
+            callbacks.ready(spectator);
             callbacks.battery(args[0]);
           } else if (cmd === BUSY) {
             if (state != STATE_BUSY) {
@@ -61,12 +120,30 @@ $(document).ready(function () {
             args.length > 0
           ) {
             callbacks.battery(args[0]);
+          } else if (
+            cmd === BATTERY_HISTORY &&
+            state === STATE_READY &&
+            args.length > 0
+          ) {
+            callbacks.batteryHistory(
+              Number(args[0]),
+              args.slice(1).map(Number),
+            );
           } else if (
             cmd === SNAPSHOT &&
             state === STATE_READY &&
             args.length > 0
           ) {
-            callbacks.snapshot(args[0]);
+            // JSON fallback: the image is base64-encoded
+            callbacks.snapshot(
+              "data:image/jpeg;base64," + args[0],
+              args.length > 1 ? Number(args[1]) : 0,
+            );
+          } else if (cmd === RTT && state === STATE_READY && args.length > 2) {
+            callbacks.rtt(args[0], args[1], args[2]);
+          } else if (cmd === FEATURES && state === STATE_READY) {
+            log(args);
+            binary_control = args.indexOf(FEATURE_BINARY_CONTROL) >= 0;
           } else {
             logError(msg);
           }
@@ -105,15 +182,39 @@ $(document).ready(function () {
     function connectionAttempt() {
       if (state === STATE_DISCONNECTED || state === STATE_BUSY) {
         socket = new WebSocket("ws://" + window.location.hostname + ":12346");
+        socket.binaryType = "arraybuffer";
         socket.onmessage = onmessage;
         socket.onclose = onclose;
         socket.onerror = onerror;
       }
     }
 
+    function sendBinary(args) {
+      var data = new ArrayBuffer(BINARY_COMMAND_SIZE);
+      var view = new DataView(data);
+      var values = args.slice(1);
+      view.setUint8(0, OPCODES[args[0]]);
+      if (values.length > 0 && values[0] in CONTROLS) {
+        view.setUint8(1, CONTROLS[values.shift()]);
+      }
+      if (values.length > 0) {
+        view.setFloat32(2, values[0]);
+      }
+      if (verbose) {
+        console.log("Network sending binary: '%s'", args);
+      }
+      socket.send(data);
+    }
+
     function send() {
-      if (state === STATE_READY) {
-        var data = JSON.stringify(Array.from(arguments));
+      // Spectators can only watch, so don't send them any commands
+      if (state === STATE_READY && (!spectator || arguments[0] === FEATURES)) {
+        var args = Array.from(arguments);
+        if (binary_control && args[0] in OPCODES) {
+          sendBinary(args);
+          return;
+        }
+        var data = JSON.stringify(args);
         if (verbose) {
           console.log("Network sending: '%s'", data);
         }
@@ -136,6 +237,9 @@ $(document).ready(function () {
       stop: function () {
         send(STOP);
       },
+      headTo: function (target) {
+        send(HEAD_TO, target);
+      },
       playSound: function (sound) {
         send(PLAY_SOUND, sound);
       },
@@ -145,6 +249,15 @@ $(document).ready(function () {
       snapshot: function () {
         send(SNAPSHOT);
       },
+      stream: function (fps) {
+        send(STREAM, fps);
+      },
+      resolution: function (resolution) {
+        send(RESOLUTION, resolution);
+      },
+      batteryHistory: function () {
+        send(BATTERY_HISTORY);
+      },
       toggleLights: function () {
         send(TOGGLE_LIGHTS);
       },
@@ -288,6 +401,34 @@ $(document).ready(function () {
     function disconnected() {
       setNormal();
       text.text("?");
+      text.removeAttr("title");
+    }
+
+    // Fits a straight line to the history, and extrapolates it to when the
+    // battery will be low
+    function predict(interval, history) {
+      var n = history.length;
+      if (n < 2) {
+        return null;
+      }
+      var mean_t = ((n - 1) * interval) / 2;
+      var mean_v =
+        history.reduce(function (a, b) {
+          return a + b;
+        }, 0) / n;
+      var num = 0;
+      var den = 0;
+      history.forEach(function (v, i) {
+        var dt = i * interval - mean_t;
+        num += dt * (v - mean_v);
+        den += dt * dt;
+      });
+      var slope = num / den;
+      var latest = history[n - 1];
+      if (slope >= 0 || latest <= LOW_THRESHOLD) {
+        return null;
+      }
+      return (latest - LOW_THRESHOLD) / -slope;
     }
 
     return {
@@ -299,13 +440,55 @@ $(document).ready(function () {
           setNormal();
         }
       },
+      setHistory: function (interval, history) {
+        var seconds = predict(interval, history);
+        if (seconds === null) {
+          text.removeAttr("title");
+        } else {
+          text.attr(
+            "title",
+            "about " + Math.round(seconds / 60) + " min until low battery",
+          );
+        }
+      },
       disconnected: disconnected,
     };
   }
 
+  function RttIndicator() {
+    var HIGH_THRESHOLD = 250;
+    var HIGH_HIGHLIGHT = "rtt-high";
+
+    var text = $("#rtt-text");
+
+    return {
+      set: function (last, mean, max) {
+        text.text(last + " ms");
+        text.attr("title", "mean " + mean + " ms, max " + max + " ms");
+        text.toggleClass(HIGH_HIGHLIGHT, Number(last) > HIGH_THRESHOLD);
+      },
+      disconnected: function () {
+        text.text("?");
+        text.removeAttr("title");
+        text.removeClass(HIGH_HIGHLIGHT);
+      },
+    };
+  }
+
   function Camera() {
     var STATIC = "static.gif";
+    var STREAM_FPS = 10;
+    var ROTATION_CLASSES = {
+      90: "camera-rotate-90",
+      180: "camera-rotate-180",
+      270: "camera-rotate-270",
+    };
+    var ROTATIONS = Object.values(ROTATION_CLASSES);
     var image = $("#camera-snapshot");
+    var stream_button = $("#stream-button");
+    var resolution_select = $("#resolution-select");
+    var object_url = null;
+    var streaming = false;
     var spinner = SpinnerWidget("#camera-images");
     var snapshot = RateLimit(2000, function () {
       socket.snapshot();
@@ -314,18 +497,63 @@ $(document).ready(function () {
     });
     var timer = Timer(snapshot.call, 30000);
 
+    function setImage(url, rotation) {
+      if (object_url !== null) {
+        URL.revokeObjectURL(object_url);
+        object_url = null;
+      }
+      if (url.startsWith("blob:")) {
+        object_url = url;
+      }
+      image.attr("src", url);
+      // The brick doesn't rotate pictures from the sideways camera, so that
+      // it never has to decode them
+      image.removeClass(ROTATIONS.join(" "));
+      if (rotation in ROTATION_CLASSES) {
+        image.addClass(ROTATION_CLASSES[rotation]);
+      }
+    }
+
+    function setStreaming(value) {
+      streaming = value;
+      stream_button.text(streaming ? "Stop stream" : "Start stream");
+    }
+
     $("#camera-button").click(snapshot.call);
     $("#camera-overlay").click(snapshot.call);
+    stream_button.click(function () {
+      if (streaming) {
+        socket.stream(0);
+        setStreaming(false);
+        timer.restart();
+      } else {
+        socket.stream(STREAM_FPS);
+        setStreaming(true);
+        timer.stop();
+      }
+    });
+
+    resolution_select.change(function () {
+      socket.resolution(resolution_select.val());
+    });
 
     return {
       snapshot: snapshot.call,
-      gotSnapshot: function (data) {
-        // data is a base64-encoded image
-        image.attr("src", "data:image/jpeg;base64," + data);
+      connected: function () {
+        // The Dalek picks the size from the connection speed unless told
+        // otherwise
+        socket.resolution(resolution_select.val());
+      },
+      gotSnapshot: function (url, rotation) {
+        setImage(url, rotation);
         spinner.stop();
+        if (streaming) {
+          timer.stop();
+        }
       },
       disconnected: function () {
-        image.attr("src", STATIC);
+        setStreaming(false);
+        setImage(STATIC, 0);
         spinner.stop();
         timer.stop();
         snapshot.reset();
@@ -353,6 +581,10 @@ $(document).ready(function () {
       },
     });
 
+    $(".head-preset-button").click(function () {
+      socket.headTo($(this).data("preset"));
+    });
+
     return {
       disconnected: function () {
         slider.slider("value", 0);
@@ -512,7 +744,9 @@ $(document).ready(function () {
   DialogBox("#btn-battery", "#battery-box", "#battery-box-close");
 
   var disconnected_box = DisconnectedBox();
+  var spectator_badge = $("#spectator-badge");
   var battery_indicator = BatteryIndicator();
+  var rtt_indicator = RttIndicator();
 
   var camera = Camera();
   var head_control = HeadControl();
@@ -538,18 +772,24 @@ $(document).ready(function () {
   });
 
   var socket = Socket({
-    ready: function () {
+    ready: function (spectator) {
       disconnected_box.hide();
-      keyboard.connected();
-      camera.snapshot();
+      spectator_badge.toggleClass("d-none", !spectator);
+      camera.connected();
+      if (!spectator) {
+        keyboard.connected();
+        camera.snapshot();
+      }
     },
     busy: function () {
       disconnected_box.show(
-        "Someone else is already connected to the Dalek. Trying to connect...",
+        "Too many people are already connected to the Dalek. Trying to connect...",
       );
     },
     disconnected: function () {
+      spectator_badge.addClass("d-none");
       battery_indicator.disconnected();
+      rtt_indicator.disconnected();
       camera.disconnected();
       head_control.disconnected();
       drive_control.disconnected();
@@ -559,11 +799,19 @@ $(document).ready(function () {
         "Lost connection to the Dalek. Trying to reconnect...",
       );
     },
-    snapshot: function (data) {
-      camera.gotSnapshot(data);
+    snapshot: function (url, rotation) {
+      camera.gotSnapshot(url, rotation);
     },
     battery: function (battery) {
       battery_indicator.set(battery);
+      // Updates only come when the voltage changes, so this is cheap
+      socket.batteryHistory();
+    },
+    batteryHistory: function (interval, history) {
+      battery_indicator.setHistory(interval, history);
+    },
+    rtt: function (last, mean, max) {
+      rtt_indicator.set(last, mean, max);
     },
   });
 });
@@ -56,8 +56,9 @@ echo 'LAUNCHER: starting dalek...'
 run-python -m dalek \
     "${SOUNDS_DIR}" \
     "${THIS_DIR}/utils/text_to_speech.sh" \
-    "${THIS_DIR}/utils/take_picture.sh" \
-    "${THIS_DIR}/picture.jpeg"
+    --capture-command "${THIS_DIR}/utils/stream_camera.sh" \
+    --camera-rotation 270 \
+    --tts-cache "${HOME}/.cache/dalek/tts"
 WEBSOCKET="${!}"
 echo "LAUNCHER: started dalek, pid ${WEBSOCKET}"
 
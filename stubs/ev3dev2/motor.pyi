@@ -6,17 +6,22 @@ OUTPUT_D: str
 class Motor:
     STOP_ACTION_COAST: str
     STOP_ACTION_BRAKE: str
+    STOP_ACTION_HOLD: str
 
     stop_action: str
     position: float
     speed_sp: float
     ramp_up_sp: float
     ramp_down_sp: float
+    position_sp: float
 
+    @property
+    def speed(self) -> float: ...
     def __init__(self, address: str) -> None: ...
     def reset(self) -> None: ...
     def stop(self) -> None: ...
     def run_forever(self) -> None: ...
+    def run_to_abs_pos(self) -> None: ...
 
 class LargeMotor(Motor): ...
 class MediumMotor(Motor): ...
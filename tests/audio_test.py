@@ -0,0 +1,164 @@
+import asyncio
+import os
+import wave
+from pathlib import Path
+
+import pytest
+
+from dalek import audio
+from dalek.audio import (
+    AplaySink,
+    Catalog,
+    FileSink,
+    Format,
+    NullSink,
+    Player,
+    load_wav,
+    sink,
+)
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+
+def _write_wav(path: Path, frames: bytes, rate: int = 8000) -> None:
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(frames)
+
+
+class TestLoadWav:
+    def test_load(self, tmp_path: Path) -> None:
+        path = tmp_path / "sound.wav"
+        _write_wav(path, bytes(range(200)))
+        clip = load_wav(str(path))
+        assert clip
+        assert clip.format == Format(1, 8000, 2)
+        assert bytes(clip.data) == bytes(range(200))
+        assert clip.duration == 100 / 8000
+
+    def test_rewritten_in_place(self, tmp_path: Path) -> None:
+        path = tmp_path / "sound.wav"
+        _write_wav(path, bytes(range(256)) * 40)
+        clip = load_wav(str(path))
+        assert clip
+        # Small clips are copied, so truncating the file can't crash playback
+        path.write_bytes(b"")
+        assert bytes(clip.data) == bytes(range(256)) * 40
+
+    def test_mapped(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(audio, "_MAX_READ_SIZE", 0)
+        path = tmp_path / "sound.wav"
+        _write_wav(path, bytes(1600))
+        clip = load_wav(str(path))
+        assert clip
+        assert clip.duration == 0.1
+
+    def test_not_a_wav(self, tmp_path: Path) -> None:
+        path = tmp_path / "sound.wav"
+        path.write_bytes(b"not a wav file at all")
+        assert load_wav(str(path)) is None
+
+    def test_truncated(self, tmp_path: Path) -> None:
+        path = tmp_path / "sound.wav"
+        path.write_bytes(b"RIFF\x00\x00\x00\x00WAVEfmt ")
+        assert load_wav(str(path)) is None
+
+
+class TestCatalog:
+    def test_catalog(self, tmp_path: Path) -> None:
+        _write_wav(tmp_path / "exterminate.wav", bytes(1600))
+        (tmp_path / "exterminate.txt").write_text("0.1\n0.5\n")
+        _write_wav(tmp_path / "no-lights.wav", b"\x00\x00")
+        (tmp_path / "odd-lights.txt").write_text("0.1\n")
+        _write_wav(tmp_path / "odd-lights.wav", b"\x00\x00")
+        (tmp_path / "readme.txt").write_text("not a sound")
+
+        c = Catalog(str(tmp_path))
+        assert len(c) == 3
+        sound = c.get("exterminate")
+        assert sound
+        assert sound.path == str(tmp_path / "exterminate.wav")
+        assert sound.duration == 0.1
+        assert list(sound.lights) == [0.1, 0.5]
+        no_lights = c.get("no-lights")
+        assert no_lights
+        assert not no_lights.lights
+        odd_lights = c.get("odd-lights")
+        assert odd_lights
+        assert not odd_lights.lights
+        assert c.get("readme") is None
+
+    def test_refresh(self, tmp_path: Path) -> None:
+        c = Catalog(str(tmp_path))
+        assert len(c) == 0
+        assert not c.refresh()
+
+        _write_wav(tmp_path / "exterminate.wav", b"\x00\x00")
+        os.utime(tmp_path, ns=(0, 1))
+        assert c.refresh()
+        assert c.get("exterminate")
+        assert not c.refresh()
+
+        # Edited in place, which doesn't change the directory
+        mtime_ns = tmp_path.stat().st_mtime_ns
+        (tmp_path / "exterminate.txt").write_text("0.1\n0.5\n")
+        os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+        assert c.refresh()
+        sound = c.get("exterminate")
+        assert sound
+        assert list(sound.lights) == [0.1, 0.5]
+
+        _write_wav(tmp_path / "exterminate.wav", bytes(1600))
+        os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+        assert c.refresh()
+        sound = c.get("exterminate")
+        assert sound
+        assert sound.duration == 0.1
+
+
+class TestPlayer:
+    def test_file_sink(self, tmp_path: Path) -> None:
+        path = tmp_path / "sound.wav"
+        frames = bytes(range(256)) * 40
+        _write_wav(path, frames)
+        clip = load_wav(str(path))
+        assert clip
+
+        out = tmp_path / "out.pcm"
+        player = Player(FileSink(str(out)), realtime=False)
+        asyncio.run(player.play(clip))
+        assert out.read_bytes() == frames
+
+    def test_stop(self, tmp_path: Path) -> None:
+        path = tmp_path / "sound.wav"
+        _write_wav(path, bytes(8000 * 2 * 10))
+        clip = load_wav(str(path))
+        assert clip
+
+        out = tmp_path / "out.pcm"
+        player = Player(FileSink(str(out)))
+
+        async def run() -> None:
+            task = asyncio.create_task(player.play(clip))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+        # Only a little more than has been heard is written ahead
+        assert 0 < len(out.read_bytes()) < 8000 * 2 * 0.5
+
+
+class TestSink:
+    def test_sink(self) -> None:
+        assert isinstance(sink("aplay"), AplaySink)
+        assert isinstance(sink("null"), NullSink)
+        assert isinstance(sink("file:/tmp/out.pcm"), FileSink)
+        with pytest.raises(ValueError, match="unknown audio sink"):
+            sink("alsa")
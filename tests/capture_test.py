@@ -0,0 +1,96 @@
+import asyncio
+import io
+import sys
+
+from PIL import Image
+
+from dalek.capture import Capture, MjpegSplitter, scale_jpeg
+from dalek.fake_capture import frame
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+_FRAME_1 = b"\xff\xd8frame one\xff\xd9"
+_FRAME_2 = b"\xff\xd8frame two\xff\xd9"
+
+
+class TestMjpegSplitter:
+    def test_whole_frames(self) -> None:
+        s = MjpegSplitter()
+        assert s.feed(_FRAME_1 + _FRAME_2) == [_FRAME_1, _FRAME_2]
+        assert s.feed(b"") == []
+
+    def test_split_frames(self) -> None:
+        s = MjpegSplitter()
+        data = b"junk" + _FRAME_1 + _FRAME_2
+        frames = []
+        for i in range(len(data)):
+            frames.extend(s.feed(data[i : i + 1]))
+        assert frames == [_FRAME_1, _FRAME_2]
+
+    def test_junk_discarded(self) -> None:
+        s = MjpegSplitter()
+        assert s.feed(b"junk\xff") == []
+        assert len(s._buffer) == 1
+        assert s.feed(b"\xd8x\xff\xd9") == [b"\xff\xd8x\xff\xd9"]
+        assert not s._buffer
+
+
+class TestScaleJpeg:
+    def test_scale(self) -> None:
+        out = io.BytesIO()
+        Image.new("RGB", (800, 600)).save(out, "JPEG")
+        scaled = scale_jpeg(out.getvalue(), 4, 50)
+        assert scaled
+        with Image.open(io.BytesIO(scaled)) as image:
+            assert image.size == (200, 150)
+
+    def test_not_a_jpeg(self) -> None:
+        assert scale_jpeg(b"junk", 2, 50) is None
+
+
+class TestCapture:
+    def test_fake_capture(self) -> None:
+        async def run() -> None:
+            frames: list[bytes] = []
+            got = asyncio.Event()
+
+            async def on_frame(frame: bytes) -> None:
+                frames.append(frame)
+                if len(frames) >= 2:
+                    got.set()
+
+            c = Capture(
+                [sys.executable, "-m", "dalek.fake_capture"],
+                None,
+                on_frame,
+            )
+            await c.start(50)
+            assert c.fps == 50
+            await asyncio.wait_for(got.wait(), timeout=10)
+            await c.stop()
+            assert c.fps is None
+
+            # Frames can be skipped, but never repeated
+            assert frames[0] in {frame(n) for n in range(10)}
+            assert frames[1] != frames[0]
+
+        asyncio.run(run())
+
+    def test_stop_straight_after_start(self) -> None:
+        async def on_frame(_: bytes) -> None:
+            pass
+
+        async def run() -> None:
+            c = Capture(
+                [sys.executable, "-m", "dalek.fake_capture"],
+                None,
+                on_frame,
+            )
+            await c.start(50)
+            p = c._process
+            assert p
+            # Before the reader task has had a chance to run
+            await c.stop()
+            assert p.returncode is not None
+
+        asyncio.run(run())
@@ -0,0 +1,372 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from dalek import ev3, latency
+from dalek.audio import NullSink
+from dalek.dalek import (
+    Dalek,
+    Head,
+    HeadPreset,
+    SpeechPolicy,
+    SpeechPriority,
+    _Battery,
+    _Camera,
+    _CoalescingWriter,
+    _Leds,
+    _Voice,
+)
+from dalek.fake_ev3 import PowerSupply
+from dalek.scheduler import Scheduler
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+
+class TestCoalescingWriter:
+    def test_merges_bursts(self) -> None:
+        async def run() -> None:
+            writes = []
+            writer = _CoalescingWriter("test", lambda: writes.append(1))
+
+            for _ in range(5):
+                writer.request()
+            assert not writes
+            await asyncio.sleep(0)
+            assert len(writes) == 1
+            assert writer.requests == 5
+            assert writer.merged == 4
+
+            writer.request()
+            await asyncio.sleep(0)
+            assert len(writes) == 2
+            assert writer.merged == 4
+
+            await writer.close()
+
+        asyncio.run(run())
+
+    def test_write_now(self) -> None:
+        async def run() -> None:
+            writes = []
+            writer = _CoalescingWriter("test", lambda: writes.append(1))
+
+            writer.request()
+            writer.request()
+            writer.write_now()
+            assert len(writes) == 1
+            assert writer.merged == 1
+            await asyncio.sleep(0)
+            assert len(writes) == 1
+
+            await writer.close()
+
+        asyncio.run(run())
+
+    def test_no_stale_trace(self) -> None:
+        async def run() -> None:
+            traces = []
+            writer = _CoalescingWriter(
+                "test",
+                lambda: traces.append(latency.current()),
+            )
+
+            with latency.tracing(latency.Trace(latency.Source.WEBSOCKET)):
+                writer.request()
+            await asyncio.sleep(0)
+            writer.request()
+            await asyncio.sleep(0)
+            assert traces == [None, None]
+
+            await writer.close()
+
+        asyncio.run(run())
+
+
+class TestVoice:
+    def test_policies(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(time, "sleep", lambda _: None)
+        played = []
+        release = asyncio.Event()
+
+        async def play(text: str) -> None:
+            played.append(text)
+            await release.wait()
+
+        async def run() -> None:
+            voice = _Voice(str(tmp_path), "true", _Leds(), NullSink(), None)
+            monkeypatch.setattr(voice, "_play", play)
+
+            await voice.speak("one")
+            await asyncio.sleep(0.01)
+            assert played == ["one"]
+
+            await voice.speak("dropped", SpeechPolicy.DROP)
+            for text in ("two", "three", "four", "five", "six"):
+                await voice.speak(text)
+            assert voice._dropped == 2
+            assert voice._max_depth == 4
+
+            await voice.speak(
+                "lifecycle",
+                SpeechPolicy.REPLACE,
+                SpeechPriority.LIFECYCLE,
+            )
+            assert voice._replaced == 5
+            await asyncio.sleep(0.01)
+            assert played == ["one", "lifecycle"]
+
+            release.set()
+            await voice.wait()
+            assert voice._played == 2
+            await voice.close()
+
+        asyncio.run(run())
+
+    def test_priority(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(time, "sleep", lambda _: None)
+        played = []
+
+        async def play(text: str) -> None:
+            played.append(text)
+            await asyncio.sleep(0)
+
+        async def run() -> None:
+            voice = _Voice(str(tmp_path), "true", _Leds(), NullSink(), None)
+            monkeypatch.setattr(voice, "_play", play)
+
+            await voice.speak("one")
+            await voice.speak("two")
+            await voice.speak(
+                "lifecycle",
+                SpeechPolicy.QUEUE,
+                SpeechPriority.LIFECYCLE,
+            )
+            await voice.wait()
+            assert played == ["lifecycle", "one", "two"]
+            await voice.close()
+
+        asyncio.run(run())
+
+    def test_wait_doesnt_block(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(time, "sleep", lambda _: None)
+        release = asyncio.Event()
+
+        async def play(_: str) -> None:
+            await release.wait()
+
+        async def run() -> None:
+            voice = _Voice(str(tmp_path), "true", _Leds(), NullSink(), None)
+            monkeypatch.setattr(voice, "_play", play)
+
+            # Like the awakening sequence, waiting for its sound to finish
+            await voice.speak("awakening")
+            waiting = asyncio.create_task(voice.wait())
+            await asyncio.sleep(0.01)
+
+            async with asyncio.timeout(0.1):
+                await voice.speak("gun")
+            assert not waiting.done()
+
+            # Stopping ends the sound that was being waited for
+            async with asyncio.timeout(0.1):
+                await voice.stop()
+                await waiting
+            await voice.close()
+
+        asyncio.run(run())
+
+
+class TestCamera:
+    def test_stops_when_idle(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(_Camera, "_SNAPSHOT_IDLE_TIME", 0.5)
+
+        async def run() -> None:
+            frames: list[bytes] = []
+
+            async def handler(frame: bytes) -> None:
+                frames.append(frame)
+
+            async with _Camera(
+                [sys.executable, "-m", "dalek.fake_capture"],
+                None,
+                10.0,
+                0,
+            ) as camera:
+                await camera.set_handler(handler)
+                await camera.take_picture()
+                assert camera._capture
+                assert camera._capture.fps
+                for _ in range(100):
+                    if frames:
+                        break
+                    await asyncio.sleep(0.05)
+                assert frames
+
+                await asyncio.sleep(0.7)
+                assert not camera._capture.fps
+
+        asyncio.run(run())
+
+
+class TestBattery:
+    def test_reports_on_change(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        volts = [8.0]
+        monkeypatch.setattr(
+            PowerSupply,
+            "measured_volts",
+            property(lambda _: volts[0]),
+        )
+        monkeypatch.setattr(_Battery, "_SAMPLE_INTERVAL", 0.001)
+        monkeypatch.setattr(_Battery, "_HISTORY_INTERVAL", 0.002)
+        monkeypatch.setattr(_Battery, "_SMOOTHING", 1.0)
+
+        async def run() -> None:
+            reports: list[str] = []
+
+            async def handler(status: str) -> None:
+                reports.append(status)
+
+            async with (
+                Scheduler() as scheduler,
+                _Battery(scheduler) as battery,
+            ):
+                await battery.set_handler(handler)
+                assert reports == ["8.00"]
+
+                # Within the hysteresis
+                volts[0] = 7.98
+                await asyncio.sleep(0.05)
+                assert reports == ["8.00"]
+
+                volts[0] = 7.9
+                await asyncio.sleep(0.05)
+                assert reports == ["8.00", "7.90"]
+
+                history = battery.history()
+                assert history[0] == 8.0
+                assert history[-1] == 7.9
+
+        asyncio.run(run())
+
+
+class TestHead:
+    def test_moves_within_limits(self) -> None:
+        async def run() -> None:
+            async with Head() as head:
+                motor = head._motor
+
+                # Turning runs to the limit, where the motor stops itself
+                await head.turn(0.5)
+                head._writer.write_now()
+                assert motor.position == Head._HEAD_LIMIT
+                assert motor.speed_sp == Head._HEAD_SPEED / 2
+
+                await head.turn_to_preset(HeadPreset.CENTER)
+                head._writer.write_now()
+                assert motor.position == 0
+
+                await head.turn_to(-2.0)
+                head._writer.write_now()
+                assert motor.position == -Head._HEAD_LIMIT
+
+                assert motor.stop_action == ev3.STOP_ACTION_HOLD
+
+                await head.turn_to(float("nan"))
+                await head.turn(1.0)
+                head._writer.write_now()
+                assert motor.position == Head._HEAD_LIMIT
+                assert motor.stop_action == ev3.STOP_ACTION_BRAKE
+
+                await head.turn_to(0.5)
+                head.stop()
+                assert motor.position == Head._HEAD_LIMIT
+
+        asyncio.run(run())
+
+
+class TestDalek:
+    def test_fast_start(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path,
+    ) -> None:
+        monkeypatch.setattr(time, "sleep", lambda _: None)
+
+        async def run() -> None:
+            async with Dalek(
+                str(tmp_path),
+                "true",
+                audio_sink=NullSink(),
+                fast_start=True,
+            ).run() as dalek:
+                times = dalek.startup_times
+                assert {"leds", "voice", "drive", "actors", "ready"} <= set(
+                    times,
+                )
+                assert "awakening" not in times
+
+        asyncio.run(run())
+
+    def test_hung_create(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path,
+    ) -> None:
+        monkeypatch.setattr(Dalek, "_CREATE_TIMEOUT", 1.5)
+        hang = threading.Event()
+        monkeypatch.setattr(Head, "__init__", lambda _: hang.wait())
+
+        async def run() -> None:
+            async with Dalek(
+                str(tmp_path),
+                "true",
+                audio_sink=NullSink(),
+                fast_start=True,
+            ).run():
+                pass
+
+        start = time.monotonic()
+        try:
+            with pytest.raises(ExceptionGroup):
+                asyncio.run(run())
+            # Not held up waiting for the hung thread
+            assert time.monotonic() - start < 3.0
+        finally:
+            hang.set()
+
+    def test_create_timeout(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path,
+    ) -> None:
+        # The LEDs take a second to set up
+        monkeypatch.setattr(Dalek, "_CREATE_TIMEOUT", 0.01)
+
+        async def run() -> None:
+            async with Dalek(
+                str(tmp_path),
+                "true",
+                audio_sink=NullSink(),
+                fast_start=True,
+            ).run():
+                pass
+
+        with pytest.raises(ExceptionGroup) as e:
+            asyncio.run(run())
+        assert e.group_contains(TimeoutError)
@@ -0,0 +1,110 @@
+import pytest
+
+from dalek import ev3, fake_ev3
+from dalek.ev3 import CachedMotor
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+
+class _CountingMotor(fake_ev3.LargeMotor):
+    def __init__(self) -> None:
+        super().__init__("test")
+        self.commands: list[str] = []
+
+    def run_forever(self) -> None:
+        self.commands.append("run_forever")
+
+    def stop(self) -> None:
+        self.commands.append("stop")
+
+
+class TestCachedMotor:
+    def test_repeated_writes_skipped(self) -> None:
+        raw = _CountingMotor()
+        motor = CachedMotor(raw, "test")
+
+        for _ in range(3):
+            motor.speed_sp = 100
+            motor.run_forever()
+        assert raw.commands == ["run_forever"]
+        assert motor.misses == 2
+        assert motor.hits == 4
+
+        for _ in range(3):
+            motor.speed_sp = 0
+            motor.stop()
+        assert raw.commands == ["run_forever", "stop"]
+        assert motor.speed_sp == 0
+
+    def test_changed_attribute_resends_command(self) -> None:
+        raw = _CountingMotor()
+        motor = CachedMotor(raw, "test")
+
+        motor.speed_sp = 100
+        motor.run_forever()
+        motor.speed_sp = 200
+        motor.run_forever()
+        assert raw.speed_sp == 200
+        assert raw.commands == ["run_forever", "run_forever"]
+
+        motor.stop()
+        motor.stop_action = "brake"
+        motor.stop()
+        assert raw.commands == ["run_forever", "run_forever", "stop", "stop"]
+
+    def test_reset(self) -> None:
+        raw = _CountingMotor()
+        motor = CachedMotor(raw, "test")
+
+        motor.speed_sp = 100
+        motor.reset()
+        motor.stop()
+        assert raw.commands == []
+
+        raw.speed_sp = 0
+        motor.speed_sp = 100
+        assert raw.speed_sp == 100
+
+    def test_position_not_cached(self) -> None:
+        raw = _CountingMotor()
+        motor = CachedMotor(raw, "test")
+
+        motor.position = 10
+        raw.position = 20
+        assert motor.position == 20
+
+
+class TestBackend:
+    @pytest.fixture(autouse=True)
+    def _reset(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(ev3, "_forced", None)
+        monkeypatch.setattr(ev3, "_backend", None)
+        monkeypatch.setattr(ev3, "_backend_name", None)
+        monkeypatch.setattr(ev3, "_backends", dict(ev3._backends))
+        monkeypatch.delenv(ev3.BACKEND_ENV, raising=False)
+
+    def test_forced(self) -> None:
+        ev3.use("fake")
+        assert ev3.backend() is fake_ev3
+        assert not ev3.is_real_ev3()
+        # Chosen once
+        ev3.use("fake")
+        with pytest.raises(ValueError, match="already using"):
+            ev3.use("ev3dev")
+
+    def test_environment(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv(ev3.BACKEND_ENV, "fake")
+        assert ev3.backend_name() == "fake"
+        ev3.use("ev3dev")
+        assert ev3.backend_name() == "ev3dev"
+
+    def test_registered(self) -> None:
+        ev3.register("test", "dalek.fake_ev3")
+        assert "test" in ev3.backends()
+        ev3.use("test")
+        assert ev3.backend() is fake_ev3
+        assert isinstance(ev3.touch_sensor(ev3.INPUT_2), fake_ev3.TouchSensor)
+
+    def test_module_name(self) -> None:
+        ev3.use("dalek.fake_ev3")
+        assert ev3.backend() is fake_ev3
@@ -0,0 +1,56 @@
+from dalek import latency
+from dalek.latency import Histogram, Source, Stage, Trace
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+
+class TestHistogram:
+    def test_empty(self) -> None:
+        h = Histogram()
+        assert h.count == 0
+        assert h.mean_ns == 0.0
+        assert h.percentile_ns(50) == 0
+
+    def test_percentiles(self) -> None:
+        h = Histogram()
+        for _ in range(99):
+            h.record(1_500)  # 1.5us, bucket [1us, 2us)
+        h.record(3_000_000)
+        assert h.count == 100
+        assert h.max_ns == 3_000_000
+        assert h.percentile_ns(50) == 2_000
+        assert h.percentile_ns(99) == 2_000
+        assert h.percentile_ns(100) == 3_000_000
+
+
+class TestTrace:
+    def setup_method(self) -> None:
+        latency.reset()
+
+    def test_written(self) -> None:
+        t = Trace(Source.WEBSOCKET, 0)
+        with latency.tracing(t):
+            assert latency.current() is t
+            t.parsed("begin drive")
+            t.dispatched()
+            t.written(t._dispatched, t._dispatched + 10)
+        assert latency.current() is None
+
+        h = latency.histograms()
+        assert {stage for (_, _, stage) in h} == set(Stage)
+        assert h[(Source.WEBSOCKET, "begin drive", Stage.WRITE)].max_ns == 10
+        assert h[(Source.WEBSOCKET, "begin drive", Stage.TOTAL)].count == 1
+
+    def test_handled(self) -> None:
+        t = Trace(Source.GAMEPAD)
+        with latency.tracing(t):
+            t.parsed("playsound")
+        assert set(latency.histograms()) == {
+            (Source.GAMEPAD, "playsound", Stage.PARSE),
+            (Source.GAMEPAD, "playsound", Stage.TOTAL),
+        }
+
+    def test_unparsed(self) -> None:
+        with latency.tracing(Trace(Source.GAMEPAD)):
+            pass
+        assert not latency.histograms()
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from dalek import latency
+from dalek.latency import Source, Trace
+from dalek.recording import Op, Record, Recorder, read
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+
+class TestRecording:
+    def test_round_trip(self, tmp_path: Path) -> None:
+        path = str(tmp_path / "session.rec")
+        with Recorder(path) as r:
+            # Not an inbound command, so not recorded
+            r.record(Op.STOP_MOVING)
+
+            start = r._start
+            with latency.tracing(Trace(Source.WEBSOCKET, start + 500_000_000)):
+                r.record(Op.DRIVE, 0.5)
+            with latency.tracing(Trace(Source.GAMEPAD, start + 1_000_000_000)):
+                r.record(Op.SPEAK, "Exterminate!")
+                r.record(Op.TAKE_PICTURE)
+
+        assert list(read(path)) == [
+            Record(0.5, Source.WEBSOCKET, Op.DRIVE, 0.5),
+            Record(1.0, Source.GAMEPAD, Op.SPEAK, "Exterminate!"),
+            Record(1.0, Source.GAMEPAD, Op.TAKE_PICTURE, None),
+        ]
+
+    def test_not_a_recording(self, tmp_path: Path) -> None:
+        path = tmp_path / "junk"
+        path.write_bytes(b"junk")
+        assert not list(read(str(path)))
+
+    def test_truncated(self, tmp_path: Path) -> None:
+        path = str(tmp_path / "session.rec")
+        with (
+            Recorder(path) as r,
+            latency.tracing(Trace(Source.WEBSOCKET, r._start)),
+        ):
+            r.record(Op.SPEAK, "Exterminate!")
+            r.record(Op.SPEAK, "Exterminate!")
+
+        with open(path, "r+b") as f:
+            f.truncate(Path(path).stat().st_size - 1)
+        assert len(list(read(path))) == 1
@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+
+import pytest
+
+from dalek.safety import PlungerGuard
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+
+class _Sensor:
+    def __init__(self) -> None:
+        super().__init__()
+        self.is_pressed = False
+
+
+def _wait_for(condition: threading.Event) -> None:
+    assert condition.wait(1)
+
+
+class TestPlungerGuard:
+    def test_stops_once_per_press(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(PlungerGuard, "_POLL_INTERVAL", 0.001)
+        sensor = _Sensor()
+        stopped = threading.Event()
+        threads: list[str] = []
+        pressed_during_stop: list[bool] = []
+
+        def on_press() -> None:
+            threads.append(threading.current_thread().name)
+            pressed_during_stop.append(guard.pressed)
+            stopped.set()
+
+        guard = PlungerGuard(sensor, on_press)
+        guard.start()
+        try:
+            time.sleep(0.01)
+            assert not threads
+
+            sensor.is_pressed = True
+            _wait_for(stopped)
+            time.sleep(0.01)
+            assert guard.pressed
+            assert threads == ["plunger"]
+
+            stopped.clear()
+            sensor.is_pressed = False
+            time.sleep(0.01)
+            assert not guard.pressed
+            sensor.is_pressed = True
+            _wait_for(stopped)
+        finally:
+            guard.stop()
+
+        assert guard.presses == 2
+        assert guard.latency.count == 2
+        assert pressed_during_stop == [True, True]
+
+    def test_retries_failed_stop(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(PlungerGuard, "_POLL_INTERVAL", 0.001)
+        sensor = _Sensor()
+        stopped = threading.Event()
+        attempts: list[int] = []
+
+        def on_press() -> None:
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError
+            stopped.set()
+
+        guard = PlungerGuard(sensor, on_press)
+        guard.start()
+        try:
+            sensor.is_pressed = True
+            _wait_for(stopped)
+        finally:
+            guard.stop()
+
+        assert len(attempts) == 2
+        assert guard.presses == 1
+
+    def test_unplugged_sensor(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        monkeypatch.setattr(PlungerGuard, "_POLL_INTERVAL", 0.001)
+        unplugged = [True]
+        sensor = _Sensor()
+
+        class _UnpluggedSensor:
+            @property
+            def is_pressed(self) -> bool:
+                if unplugged[0]:
+                    # Like ev3dev2's DeviceNotFound, not an OSError
+                    raise LookupError
+                return sensor.is_pressed
+
+        stopped = threading.Event()
+        guard = PlungerGuard(_UnpluggedSensor(), stopped.set)
+        guard.start()
+        try:
+            time.sleep(0.02)
+            unplugged[0] = False
+            sensor.is_pressed = True
+            _wait_for(stopped)
+        finally:
+            guard.stop()
+
+        failures = [r for r in caplog.records if r.levelno >= logging.ERROR]
+        assert len(failures) == 1
+        assert "failed to read plunger" in failures[0].getMessage()
+        assert guard.presses == 1
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+from dalek.scheduler import Scheduler
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+
+def _slow() -> None:
+    time.sleep(0.035)
+
+
+class TestScheduler:
+    def test_rate(self) -> None:
+        async def run() -> None:
+            ticks: list[int] = []
+            async with Scheduler() as scheduler:
+                job = scheduler.every("test", 0.01, lambda: ticks.append(1))
+                await asyncio.sleep(0.105)
+                assert 8 <= len(ticks) <= 11
+                assert job.runs == len(ticks)
+
+        asyncio.run(run())
+
+    def test_same_phase_runs_together(self) -> None:
+        async def run() -> None:
+            times: dict[str, list[int]] = {"a": [], "b": []}
+            async with Scheduler() as scheduler:
+                scheduler.every(
+                    "a",
+                    0.01,
+                    lambda: times["a"].append(time.monotonic_ns()),
+                )
+                await asyncio.sleep(0.003)
+                scheduler.every(
+                    "b",
+                    0.01,
+                    lambda: times["b"].append(time.monotonic_ns()),
+                )
+                await asyncio.sleep(0.05)
+
+            a = times["a"][-len(times["b"]) :]
+            assert times["b"]
+            # Same wakeup, so only the cost of running the first job apart
+            for x, y in zip(a, times["b"], strict=True):
+                assert 0 <= y - x < 2_000_000
+
+        asyncio.run(run())
+
+    def test_async_job(self) -> None:
+        async def run() -> None:
+            ticks: list[int] = []
+
+            async def job() -> None:
+                await asyncio.sleep(0)
+                ticks.append(1)
+
+            async with Scheduler() as scheduler:
+                scheduler.every("test", 0.01, job)
+                await asyncio.sleep(0.05)
+            assert ticks
+
+        asyncio.run(run())
+
+    def test_overruns_skipped(self) -> None:
+        async def run() -> None:
+            async with Scheduler() as scheduler:
+                job = scheduler.every("slow", 0.01, _slow)
+                await asyncio.sleep(0.1)
+                # Missed periods are counted rather than run back to back
+                assert job.overruns >= 2 * job.runs - 2
+                assert job.runs <= 4
+                assert job.jitter.count == job.runs
+
+        asyncio.run(run())
+
+    def test_cancel(self) -> None:
+        async def run() -> None:
+            ticks: list[int] = []
+            async with Scheduler() as scheduler:
+                job = scheduler.every("test", 0.01, lambda: ticks.append(1))
+                await asyncio.sleep(0.03)
+                job.cancel()
+                n = len(ticks)
+                await asyncio.sleep(0.03)
+                assert len(ticks) == n
+                assert not scheduler.jobs
+
+        asyncio.run(run())
+
+    def test_failing_job_kept(self) -> None:
+        failures = [True, True, False]
+
+        def flaky() -> None:
+            if failures and failures.pop(0):
+                raise ValueError
+
+        async def run() -> None:
+            ticks: list[int] = []
+            async with Scheduler() as scheduler:
+                bad = scheduler.every("bad", 0.01, flaky)
+                scheduler.every("good", 0.01, lambda: ticks.append(1))
+                await asyncio.sleep(0.05)
+                assert not bad.cancelled
+                assert bad.failures == 2
+                assert bad.runs >= 3
+                assert len(ticks) >= 3
+
+        asyncio.run(run())
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+from benchmarks.startup import import_time_us
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+# Several times what it takes on a laptop, so only real regressions fail;
+# the brick is far slower
+_IMPORT_BUDGET_US = 300_000
+
+# Only imported when they're needed
+_LAZY_MODULES = ("aiofiles", "ev3dev2", "evdev", "PIL")
+
+
+class TestStartup:
+    def test_import_budget(self) -> None:
+        best = min(import_time_us("dalek.__main__") for _ in range(3))
+        assert 0 < best < _IMPORT_BUDGET_US
+
+    def test_lazy_imports(self) -> None:
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, dalek.__main__; print(' '.join(sys.modules))",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        imported = set(result.stdout.split())
+        for module in _LAZY_MODULES:
+            assert module not in imported
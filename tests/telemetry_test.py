@@ -0,0 +1,86 @@
+import asyncio
+import math
+
+from dalek.scheduler import Scheduler
+from dalek.telemetry import Probe, Telemetry, decode, encode
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+
+class TestEncode:
+    def test_round_trip(self) -> None:
+        values = [1.5, 1.52, 1.49, -3.0, 0.0]
+        encoded = encode(values, 100)
+        assert encoded == "150,2,-3,-449,300"
+        assert decode(encoded, 100) == values
+
+    def test_missing(self) -> None:
+        encoded = encode([3.0, math.nan, 5.0], 1)
+        assert encoded == "3,,2"
+        decoded = decode(encoded, 1)
+        assert decoded[0] == 3.0
+        assert math.isnan(decoded[1])
+        assert decoded[2] == 5.0
+
+    def test_empty(self) -> None:
+        assert not encode([], 1)
+        assert not decode("", 1)
+
+
+class TestTelemetry:
+    def test_batch(self) -> None:
+        telemetry = Telemetry(Scheduler(), {"a": Probe(lambda: 0.0, 1)})
+        values = iter(range(1000))
+        telemetry._reads[0] = lambda: float(next(values))
+        for _ in range(5):
+            telemetry._sample()
+
+        start, batch = telemetry.batch(["a"], 0, 2)
+        assert start == 5
+        assert batch == ["0", "0.1", "a", "1", "0,2,2"]
+        assert telemetry.batch(["a"], start, 2) == (5, [])
+
+        telemetry._sample()
+        telemetry._sample()
+        start, batch = telemetry.batch(["a"], start, 2)
+        assert start == 7
+        assert batch == ["6", "0.1", "a", "1", "6"]
+
+    def test_failed_read(self) -> None:
+        def unplugged() -> float:
+            raise LookupError
+
+        telemetry = Telemetry(
+            Scheduler(),
+            {"a": Probe(unplugged, 1), "b": Probe(lambda: 2.0, 1)},
+        )
+        telemetry._sample()
+        _, batch = telemetry.batch(["a", "b"], 0, 1)
+        assert batch == ["0", "0.05", "a", "1", "", "b", "1", "2"]
+
+    def test_overwritten(self) -> None:
+        telemetry = Telemetry(Scheduler(), {"a": Probe(lambda: 1.0, 1)})
+        capacity = telemetry._buffers[0].capacity
+        for _ in range(capacity + 10):
+            telemetry._sample()
+        _, batch = telemetry.batch(["a"], 0, 1)
+        assert batch[0] == "10"
+        assert len(decode(batch[4], 1)) == capacity
+
+    def test_subscribe(self) -> None:
+        async def run() -> None:
+            async with Scheduler() as scheduler:
+                telemetry = Telemetry(scheduler, {"a": Probe(lambda: 1.0, 1)})
+                telemetry.subscribe()
+                telemetry.subscribe()
+                await asyncio.sleep(0.12)
+                telemetry.unsubscribe()
+                assert telemetry._job
+                telemetry.unsubscribe()
+                assert not telemetry._job
+                count = telemetry.count
+                assert count >= 2
+                await asyncio.sleep(0.1)
+                assert telemetry.count == count
+
+        asyncio.run(run())
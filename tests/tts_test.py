@@ -0,0 +1,103 @@
+import asyncio
+import wave
+from pathlib import Path
+
+from dalek.tts import Cache
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+
+def _command(tmp_path: Path) -> str:
+    template = tmp_path / "template.wav"
+    with wave.open(str(template), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(bytes(1000))
+
+    command = tmp_path / "tts.sh"
+    command.write_text(
+        f'#!/bin/sh\necho "$1" >> {tmp_path}/log\ncp {template} "$2"\n',
+    )
+    command.chmod(0o755)
+    return str(command)
+
+
+class TestCache:
+    def test_cache(self, tmp_path: Path) -> None:
+        command = _command(tmp_path)
+        cache_dir = str(tmp_path / "cache")
+
+        async def run() -> None:
+            c = Cache(cache_dir, command, 10000)
+            clips = await asyncio.gather(c.get("Dalek"), c.get("Dalek"))
+            assert all(clip and clip.duration == 500 / 8000 for clip in clips)
+            assert await c.get("Dalek")
+            assert c.hits == 1
+            assert c.misses == 2
+            assert c.size > 1000
+
+        asyncio.run(run())
+        # Synthesized once, with the espeakified text
+        assert (tmp_path / "log").read_text() == "Dahlek\n"
+
+        async def reload() -> None:
+            c = Cache(cache_dir, command, 10000)
+            assert await c.get("Dalek")
+            assert c.hits == 1
+
+        asyncio.run(reload())
+
+    def test_eviction(self, tmp_path: Path) -> None:
+        command = _command(tmp_path)
+
+        async def run() -> None:
+            c = Cache(str(tmp_path / "cache"), command, 2500)
+            await c.prewarm(["one", "two"])
+            assert len(c._entries) == 2
+            await c.get("one")
+            await c.get("three")
+            # 'two' was least recently used
+            assert len(c._entries) == 2
+            assert c._name("two") not in c._entries
+            assert c._name("one") in c._entries
+
+        asyncio.run(run())
+
+    def test_failure(self, tmp_path: Path) -> None:
+        async def run() -> None:
+            c = Cache(str(tmp_path / "cache"), "false", 10000)
+            assert await c.get("Dalek") is None
+            assert not c._pending
+
+        asyncio.run(run())
+
+    def test_deleted_entry(self, tmp_path: Path) -> None:
+        command = _command(tmp_path)
+
+        async def run() -> None:
+            c = Cache(str(tmp_path / "cache"), command, 100000)
+            assert await c.get("one")
+            (tmp_path / "cache" / c._name("one")).unlink()
+            assert await c.get("one")
+            assert c.hits == 0
+            assert c.misses == 2
+            assert (tmp_path / "cache" / c._name("one")).exists()
+
+        asyncio.run(run())
+
+    def test_leaves_other_files(self, tmp_path: Path) -> None:
+        cache_dir = tmp_path / "cache"
+        cache_dir.mkdir()
+        (cache_dir / "notes.txt").write_text("mine")
+        (cache_dir / "song.wav").write_bytes(bytes(5000))
+        (cache_dir / "subdir").mkdir()
+        interrupted = cache_dir / ("0" * 64 + ".wav.tmp")
+        interrupted.write_bytes(b"partial")
+
+        c = Cache(str(cache_dir), _command(tmp_path), 2500)
+        assert not c._entries
+        assert c.size == 0
+        assert not interrupted.exists()
+        assert (cache_dir / "notes.txt").exists()
+        assert (cache_dir / "song.wav").exists()
@@ -1,4 +1,8 @@
+import asyncio
+
 from dalek.utils import (
+    LatestValue,
+    RingBuffer,
     Sign,
     clamp_control_range,
     espeakify,
@@ -28,8 +32,47 @@ class TestNumericUtils:
         assert clamp_control_range(0.5) == 0.5
         assert clamp_control_range(1.0) == 1.0
         assert clamp_control_range(10.0) == 1.0
+        assert clamp_control_range(float("inf")) == 1.0
+        assert clamp_control_range(float("nan")) == 0.0
 
     def test_sign(self) -> None:
         assert sign(-1.0) == Sign.NEGATIVE
         assert sign(0.0) == Sign.ZERO
         assert sign(1.0) == Sign.POSITIVE
+
+
+class TestLatestValue:
+    def test_latest_value(self) -> None:
+        async def run() -> None:
+            v = LatestValue[int]()
+            v.put(1)
+            v.put(2)
+            v.put(3)
+            assert await v.get() == 3
+            assert v.dropped == 2
+
+            task = asyncio.create_task(v.get())
+            await asyncio.sleep(0)
+            assert not task.done()
+            v.put(4)
+            assert await task == 4
+            assert v.dropped == 2
+
+        asyncio.run(run())
+
+
+class TestRingBuffer:
+    def test_ring_buffer(self) -> None:
+        r = RingBuffer(3)
+        assert r.capacity == 3
+        assert not r.values()
+        r.append(1)
+        r.append(2)
+        assert r.values() == [1, 2]
+        r.append(3)
+        r.append(4)
+        assert len(r) == 3
+        assert r.values() == [2, 3, 4]
+        assert r.latest(2) == [3, 4]
+        r.clear()
+        assert not r.values()
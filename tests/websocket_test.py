@@ -0,0 +1,171 @@
+import asyncio
+from typing import TYPE_CHECKING, cast
+
+import pytest
+
+from dalek import websocket
+from dalek.fake_capture import frame
+from dalek.websocket import (
+    _BINARY_COMMAND,
+    _FRAME_HEADER,
+    _THROUGHPUT_WINDOW,
+    _THUMBNAIL_LEVEL,
+    _binary_frame,
+    _FrameType,
+    _Image,
+    _parse_binary_message,
+    _parse_message,
+    _Role,
+)
+
+if TYPE_CHECKING:
+    from websockets.asyncio.server import ServerConnection
+
+    from dalek.dalek import Dalek
+
+# ruff: noqa: PLR2004, S101, SLF001
+
+
+class TestParseMessage:
+    def test_valid(self) -> None:
+        assert _parse_message('["begin", "drive", 0.5]') == (
+            "begin",
+            ["drive", "0.5"],
+        )
+        assert _parse_message(b'["stop"]') == ("stop", [])
+
+    def test_invalid(self) -> None:
+        assert _parse_message(b"\xff") is None
+        assert _parse_message("not json") is None
+        assert _parse_message('{"begin": 1}') is None
+        assert _parse_message("[]") is None
+
+
+class TestParseBinaryMessage:
+    def test_valid(self) -> None:
+        assert _parse_binary_message(_BINARY_COMMAND.pack(1, 1, 0.5)) == (
+            "begin",
+            ["drive", 0.5],
+        )
+        assert _parse_binary_message(_BINARY_COMMAND.pack(2, 3, -1.0)) == (
+            "release",
+            ["headturn", -1.0],
+        )
+        assert _parse_binary_message(_BINARY_COMMAND.pack(6, 0, 5.0)) == (
+            "stream",
+            [5.0],
+        )
+        assert _parse_binary_message(_BINARY_COMMAND.pack(3, 0, 0.0)) == (
+            "stop",
+            [],
+        )
+
+    def test_invalid(self) -> None:
+        assert _parse_binary_message(b"") is None
+        assert (
+            _parse_binary_message(_BINARY_COMMAND.pack(1, 1, 0.5)[:-1]) is None
+        )
+        assert _parse_binary_message(_BINARY_COMMAND.pack(99, 0, 0.0)) is None
+        assert _parse_binary_message(_BINARY_COMMAND.pack(1, 99, 0.0)) is None
+
+
+class TestBinaryFrame:
+    def test_binary_frame(self) -> None:
+        frame = _binary_frame(_FrameType.SNAPSHOT, 2, 3, b"jpeg")
+        assert _FRAME_HEADER.unpack_from(frame) == (_FrameType.SNAPSHOT, 2, 3)
+        assert frame[_FRAME_HEADER.size :] == b"jpeg"
+
+    def test_sequence_wraps(self) -> None:
+        frame = _binary_frame(_FrameType.SNAPSHOT, 0, 0x10001, b"")
+        assert _FRAME_HEADER.unpack_from(frame) == (_FrameType.SNAPSHOT, 0, 1)
+
+
+class TestImage:
+    def test_encodings(self) -> None:
+        async def run() -> None:
+            image = _Image(7, b"jpeg", 270)
+            assert len(image) == 4
+            binary = await image.binary_message(0)
+            assert binary == _binary_frame(_FrameType.SNAPSHOT, 3, 7, b"jpeg")
+            assert await image.binary_message(0) is binary
+            json_message = await image.json_message(0)
+            assert json_message == '["snapshot", "anBlZw==", "270"]\n'
+            assert await image.json_message(0) is json_message
+
+        asyncio.run(run())
+
+    def test_scaled(self) -> None:
+        async def run() -> None:
+            full = frame(0)
+            image = _Image(0, full, 0)
+            thumbnail = await image.data(_THUMBNAIL_LEVEL)
+            assert thumbnail != full
+            assert thumbnail.startswith(b"\xff\xd8")
+            assert await image.data(_THUMBNAIL_LEVEL) is thumbnail
+
+            # Not a JPEG, so sent at full size
+            assert await _Image(0, b"jpeg", 0).data(1) == b"jpeg"
+
+        asyncio.run(run())
+
+
+class _StalledWebsocket:
+    """Answers pings, but never finishes sending anything."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.pings = 0
+
+    async def ping(self) -> asyncio.Future[float]:
+        self.pings += 1
+        pong = asyncio.get_running_loop().create_future()
+        pong.set_result(0.001)
+        return pong
+
+    async def send(self, _: str | bytes) -> None:
+        await asyncio.Event().wait()
+
+
+class _FastWebsocket:
+    async def send(self, _: str | bytes) -> None:
+        pass
+
+
+class TestController:
+    def test_resolution_recovers(self) -> None:
+        async def run() -> None:
+            c = websocket._Controller(
+                cast("ServerConnection", _FastWebsocket()),
+                cast("Dalek", None),
+                _Role.SPECTATOR,
+            )
+            image = _Image(0, bytes(200_000), 0)
+            for _ in range(_THROUGHPUT_WINDOW):
+                c._record_send(100_000, 2.0)
+            assert c._image_level(len(image)) == _THUMBNAIL_LEVEL
+
+            # Sends that return at once show the link is fast again
+            for _ in range(_THROUGHPUT_WINDOW):
+                await c._send_image(image)
+            assert c._image_level(len(image)) == 0
+
+        asyncio.run(run())
+
+    def test_heartbeat_not_held_up_by_sends(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(websocket, "_HEARTBEAT_INTERVAL", 0.01)
+        monkeypatch.setattr(websocket, "_RTT_REPORT_INTERVAL", 1)
+
+        async def run() -> None:
+            ws = _StalledWebsocket()
+            async with websocket._Controller(
+                cast("ServerConnection", ws),
+                cast("Dalek", None),
+                _Role.SPECTATOR,
+            ):
+                await asyncio.sleep(0.1)
+            assert ws.pings >= 5
+
+        asyncio.run(run())
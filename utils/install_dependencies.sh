@@ -21,7 +21,7 @@ function download() {
 }
 
 sudo -S true
-sudo apt-get -y install streamer espeak imagemagick wget unzip
+sudo apt-get -y install ffmpeg espeak wget unzip libjpeg-dev zlib1g-dev
 
 cd "${DALEK_ROOT}/html"
 download https://github.com/twbs/bootstrap/releases/download/v5.3.6/bootstrap-5.3.6-dist.zip
@@ -0,0 +1,19 @@
+#!/bin/bash
+# Streams MJPEG from the camera to stdout until killed. The camera's own JPEG
+# frames are passed through untouched; the Dalek's camera is on its side, but
+# clients rotate the pictures for display.
+
+set -eu
+
+function usage() {
+    echo "Usage: $(basename "${0}") fps [device]"
+    exit 1
+}
+
+test -z "${1:-}" && usage
+FPS="${1}"
+DEVICE="${2:-/dev/video0}"
+
+exec ffmpeg -loglevel error \
+    -f v4l2 -input_format mjpeg -framerate "${FPS}" -video_size 800x600 \
+    -i "${DEVICE}" -c:v copy -f mjpeg -
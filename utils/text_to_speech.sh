@@ -1,11 +1,16 @@
 #!/bin/bash
 # Espeak on ev3dev is a bit temperamental, and this is easier than messing with
-# pipes in python.
+# pipes in python. If an output file is given, the speech is saved there as a
+# WAV instead of being played.
 
 set -eu
 
 if [ -n "${1:-}" ]; then
-    espeak -a 200 -s 120 --stdout "${1}" | aplay
+    if [ -n "${2:-}" ]; then
+        espeak -a 200 -s 120 -w "${2}" "${1}"
+    else
+        espeak -a 200 -s 120 --stdout "${1}" | aplay
+    fi
 fi
 
 exit 0